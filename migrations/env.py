@@ -96,6 +96,18 @@ def run_migrations_online():
 
     connectable = get_engine()
 
+    # los índices declarados con ddl_if(dialect=...) (p. ej. los de trigramas,
+    # solo en Postgres) no existen en otros dialectos: autogenerate no debe
+    # proponer crearlos allí
+    def include_object(object, name, type_, reflected, compare_to):
+        ddl_if = getattr(object, "_ddl_if", None)
+        if type_ == "index" and ddl_if is not None and ddl_if.dialect:
+            return connectable.dialect.name == ddl_if.dialect
+        return True
+
+    if conf_args.get("include_object") is None:
+        conf_args["include_object"] = include_object
+
     with connectable.connect() as connection:
         context.configure(
             connection=connection,
@@ -0,0 +1,47 @@
+"""user order summary
+
+Revision ID: b2d4f6a8c013
+Revises: a1c3e5f7b901
+Create Date: 2026-10-18 10:03:27.540912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2d4f6a8c013'
+down_revision = 'a1c3e5f7b901'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('order_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('order_total', sa.Float(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('pending_order_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('completed_order_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('cancelled_order_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('last_order_at', sa.DateTime(), nullable=True))
+
+    # Rellenar el resumen con los pedidos existentes
+    op.execute("""
+        UPDATE "user" SET
+            order_count = (SELECT COUNT(*) FROM "order" o WHERE o.user_id = "user".id),
+            order_total = (SELECT COALESCE(SUM(o.amount), 0) FROM "order" o WHERE o.user_id = "user".id),
+            pending_order_count = (SELECT COUNT(*) FROM "order" o WHERE o.user_id = "user".id AND o.status = 'pending'),
+            completed_order_count = (SELECT COUNT(*) FROM "order" o WHERE o.user_id = "user".id AND o.status = 'completed'),
+            cancelled_order_count = (SELECT COUNT(*) FROM "order" o WHERE o.user_id = "user".id AND o.status = 'cancelled'),
+            last_order_at = (SELECT MAX(o.created_at) FROM "order" o WHERE o.user_id = "user".id)
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('last_order_at')
+        batch_op.drop_column('cancelled_order_count')
+        batch_op.drop_column('completed_order_count')
+        batch_op.drop_column('pending_order_count')
+        batch_op.drop_column('order_total')
+        batch_op.drop_column('order_count')
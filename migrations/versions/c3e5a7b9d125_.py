@@ -0,0 +1,50 @@
+"""change log
+
+Revision ID: c3e5a7b9d125
+Revises: b2d4f6a8c013
+Create Date: 2026-10-18 11:20:52.004318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e5a7b9d125'
+down_revision = 'b2d4f6a8c013'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('change_log',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('txid', sa.BigInteger(), server_default='0', nullable=False),
+    sa.Column('entity_type', sa.String(length=20), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('action', sa.String(length=20), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('change_log', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_change_log_changed_at'), ['changed_at'], unique=False)
+        batch_op.create_index('ix_change_log_txid_id', ['txid', 'id'], unique=False)
+
+    # Los datos existentes entran como 'created' (txid 0, antes que cualquier
+    # transacción posterior) para que since=0 sea una sincronización completa
+    op.execute("""
+        INSERT INTO change_log (entity_type, entity_id, action, changed_at)
+        SELECT 'user', id, 'created', created_at FROM "user" ORDER BY id
+    """)
+    op.execute("""
+        INSERT INTO change_log (entity_type, entity_id, action, changed_at)
+        SELECT 'order', id, 'created', created_at FROM "order" ORDER BY id
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('change_log', schema=None) as batch_op:
+        batch_op.drop_index('ix_change_log_txid_id')
+        batch_op.drop_index(batch_op.f('ix_change_log_changed_at'))
+
+    op.drop_table('change_log')
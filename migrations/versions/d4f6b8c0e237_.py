@@ -0,0 +1,47 @@
+"""archived orders
+
+Revision ID: d4f6b8c0e237
+Revises: c3e5a7b9d125
+Create Date: 2026-10-18 12:41:09.771530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f6b8c0e237'
+down_revision = 'c3e5a7b9d125'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('archived_order',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('product_name', sa.String(length=120), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('archived_order', schema=None) as batch_op:
+        batch_op.create_index('ix_archived_order_created_at', ['created_at'], unique=False)
+        batch_op.create_index('ix_archived_order_user_id_created_at', ['user_id', 'created_at'], unique=False)
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('archived_order_count', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('archived_order_count')
+
+    with op.batch_alter_table('archived_order', schema=None) as batch_op:
+        batch_op.drop_index('ix_archived_order_user_id_created_at')
+        batch_op.drop_index('ix_archived_order_created_at')
+
+    op.drop_table('archived_order')
@@ -0,0 +1,86 @@
+"""
+Benchmark de compresión de respuestas: coste de CPU frente a bytes ahorrados.
+Comprime los payloads de ejemplo del repositorio y un listado sintético de
+100 pedidos (el tamaño máximo de página) con gzip y brotli a varios niveles,
+para elegir COMPRESSION_GZIP_LEVEL y COMPRESSION_BROTLI_QUALITY.
+
+Uso (desde la raíz del repositorio):
+    python scripts/compression_benchmark.py --runs 20
+"""
+import argparse
+import gzip
+import json
+import os
+import statistics
+import time
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SAMPLE_FILES = ("ejemplo_usuarios.json", "ejemplo_usuarios_carga.json", "ejemplo_pedidos_carga.json")
+GZIP_LEVELS = (1, 6, 9)
+BROTLI_QUALITIES = (1, 4, 6, 11)
+
+
+def load_payloads():
+    """Returns: [(nombre, bytes)] con el JSON tal y como lo enviaría la API"""
+    payloads = []
+    for filename in SAMPLE_FILES:
+        with open(os.path.join(ROOT_DIR, filename), encoding="utf-8") as file:
+            payloads.append((filename, json.dumps(json.load(file)).encode()))
+
+    orders = [{
+        "id": index,
+        "user_id": index % 37 + 1,
+        "product_name": f"Producto {index % 50}",
+        "amount": round(10 + index * 1.37, 2),
+        "status": ("pending", "completed", "cancelled")[index % 3],
+        "created_at": f"2025-10-{index % 28 + 1:02d}T12:{index % 60:02d}:00",
+        "user_name": f"Usuario {index % 37 + 1}",
+    } for index in range(100)]
+    listing = {"orders": orders, "total": 5000, "page": 1, "per_page": 100, "total_pages": 50}
+    payloads.append(("listado 100 pedidos", json.dumps(listing).encode()))
+    return payloads
+
+
+def codecs():
+    for level in GZIP_LEVELS:
+        yield f"gzip-{level}", lambda data, level=level: gzip.compress(data, compresslevel=level, mtime=0)
+    if brotli is not None:
+        for quality in BROTLI_QUALITIES:
+            yield f"br-{quality}", lambda data, quality=quality: brotli.compress(data, quality=quality)
+
+
+def measure(compressor, data, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        compressed = compressor(data)
+        timings.append(time.perf_counter() - start)
+    return len(compressed), statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    if brotli is None:
+        print("brotli no está instalado: solo se mide gzip\n")
+
+    for name, data in load_payloads():
+        print(f"{name}: {len(data)} bytes")
+        print(f"  {'codec':<10}{'bytes':>10}{'ratio':>9}{'ahorro':>10}{'ms':>9}{'MB/s':>9}")
+        for codec, compressor in codecs():
+            size, seconds = measure(compressor, data, args.runs)
+            print(f"  {codec:<10}{size:>10}{size / len(data):>9.3f}"
+                  f"{len(data) - size:>10}{seconds * 1000:>9.3f}"
+                  f"{len(data) / seconds / 1e6:>9.1f}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,440 @@
+"""
+Generador de carga por escenarios con la mezcla de tráfico de producción.
+Lee los escenarios de un fichero JSON (por defecto loadtest_scenarios.json):
+cada uno tiene un tipo (search_as_you_type, paging, export, batch_upload,
+status_patch, claim), un peso en la mezcla, parámetros y umbrales de SLO. Informa
+por escenario de percentiles de latencia, tasa de errores y consultas SQL
+por petición, y termina con código 1 si se incumple algún SLO.
+
+Los umbrales de "slo" son los de producción (Postgres). En SQLite las
+escrituras se serializan y su latencia con varios hilos mide sobre todo la
+espera al lock de la base, así que la ejecución en proceso aplica encima los
+de "slo_sqlite" del escenario; un valor null desactiva ese umbral.
+
+Por defecto levanta la app en el propio proceso con create_app() sobre una
+base SQLite temporal (sin rate limiting ni admin) y la puebla con datos
+generados a partir de los ficheros de ejemplo. Con --base-url se lanza
+contra una instancia ya en marcha (sin recuento de consultas).
+
+Uso (desde la raíz del repositorio):
+    python scripts/loadtest.py --duration 20 --concurrency 8
+    python scripts/loadtest.py --scenarios mis_escenarios.json --only search_as_you_type
+    python scripts/loadtest.py --base-url http://localhost:3001 --no-seed
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SRC_DIR = os.path.join(ROOT_DIR, "src")
+DEFAULT_SCENARIOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "loadtest_scenarios.json")
+BATCH_LIMIT = 1000
+ORDER_STATUSES = ("pending", "completed", "cancelled")
+
+
+# ============== CLIENTES ==============
+
+class InProcessClient:
+    """
+    Peticiones con el test client de Flask sobre create_app(), contando las
+    consultas SQL que ejecuta cada petición en su hilo.
+    """
+    counts_queries = True
+    slo_overrides = "slo_sqlite"
+
+    def __init__(self, database_path):
+        sys.path.insert(0, SRC_DIR)
+        from sqlalchemy import event
+        from app import create_app
+        from api.models import db
+
+        self.app = create_app({
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{database_path}",
+            "SQLALCHEMY_ENGINE_OPTIONS": {"connect_args": {"timeout": 30}},
+            "ENABLE_ADMIN": False,
+            "RATELIMIT_ENABLED": False,
+        }, with_cli=False)
+        self._local = threading.local()
+        with self.app.app_context():
+            db.create_all()
+            event.listen(db.engine, "before_cursor_execute", self._count_query)
+
+    def _count_query(self, *args):
+        self._local.queries = getattr(self._local, "queries", 0) + 1
+
+    def request(self, method, path, body=None):
+        """Returns: (status, segundos, consultas SQL, cuerpo JSON o None)"""
+        if not hasattr(self._local, "client"):
+            self._local.client = self.app.test_client()
+        self._local.queries = 0
+        start = time.perf_counter()
+        response = self._local.client.open(path, method=method, json=body)
+        data = response.get_data()
+        elapsed = time.perf_counter() - start
+        return response.status_code, elapsed, self._local.queries, _parse_json(data, response.mimetype)
+
+
+class HttpClient:
+    """Peticiones HTTP contra una instancia en marcha (--base-url)"""
+    counts_queries = False
+    slo_overrides = None
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(
+            self.base_url + path, data=data, method=method,
+            headers={"Content-Type": "application/json"} if data else {}
+        )
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                status, payload = response.status, response.read()
+                mimetype = response.headers.get_content_type()
+        except urllib.error.HTTPError as error:
+            status, payload, mimetype = error.code, error.read(), error.headers.get_content_type()
+        except (urllib.error.URLError, OSError):
+            status, payload, mimetype = 0, b"", None
+        elapsed = time.perf_counter() - start
+        return status, elapsed, None, _parse_json(payload, mimetype)
+
+
+def _parse_json(data, mimetype):
+    if mimetype != "application/json":
+        return None
+    try:
+        return json.loads(data)
+    except ValueError:
+        return None
+
+
+# ============== DATOS ==============
+
+class Dataset:
+    """Valores de ejemplo y los ids existentes que usan los escenarios"""
+
+    def __init__(self):
+        with open(os.path.join(ROOT_DIR, "ejemplo_usuarios_carga.json"), encoding="utf-8") as file:
+            self.sample_users = json.load(file)["users"]
+        with open(os.path.join(ROOT_DIR, "ejemplo_usuarios.json"), encoding="utf-8") as file:
+            self.sample_users += json.load(file)["users"]
+        with open(os.path.join(ROOT_DIR, "ejemplo_pedidos_carga.json"), encoding="utf-8") as file:
+            self.sample_orders = json.load(file)
+        self.search_terms = sorted({user["name"] for user in self.sample_users})
+        self.user_ids = []
+        self.order_ids = []
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def next_sequence(self):
+        with self._lock:
+            self._sequence += 1
+            return self._sequence
+
+    def generate_users(self, count, rng):
+        run = f"{int(time.time())}{rng.randrange(1000):03d}"
+        users = []
+        for _ in range(count):
+            sample = rng.choice(self.sample_users)
+            local, domain = sample["email"].split("@", 1)
+            users.append({
+                "name": sample["name"],
+                "email": f"{local}.{run}.{self.next_sequence()}@{domain}"
+            })
+        return users
+
+    def generate_orders(self, count, rng):
+        return [{
+            "user_id": rng.choice(self.user_ids),
+            "product_name": rng.choice(self.sample_orders)["product_name"],
+            "amount": round(rng.uniform(5, 500), 2)
+        } for _ in range(count)]
+
+    def load_ids(self, client, pages=5):
+        """Lee ids de usuarios y pedidos existentes a través de la API"""
+        for page in range(1, pages + 1):
+            status, _, _, body = client.request("GET", f"/api/users?page={page}&per_page=100")
+            if status == 200 and body:
+                self.user_ids += [user["id"] for user in body["users"]]
+            status, _, _, body = client.request("GET", f"/api/orders?page={page}&per_page=100")
+            if status == 200 and body:
+                self.order_ids += [order["id"] for order in body["orders"]]
+
+
+def seed(client, dataset, users, orders, rng):
+    """Puebla la base de datos mediante los endpoints de carga masiva"""
+    for start in range(0, users, BATCH_LIMIT):
+        batch = dataset.generate_users(min(BATCH_LIMIT, users - start), rng)
+        status, _, _, body = client.request("POST", "/api/users/batch", {"users": batch})
+        if status != 201:
+            raise SystemExit(f"Seed de usuarios fallido ({status}): {body}")
+        dataset.user_ids += [user["id"] for user in body["users"]]
+
+    for start in range(0, orders, BATCH_LIMIT):
+        batch = dataset.generate_orders(min(BATCH_LIMIT, orders - start), rng)
+        status, _, _, body = client.request("POST", "/api/orders/batch", {"orders": batch})
+        if status != 201:
+            raise SystemExit(f"Seed de pedidos fallido ({status}): {body}")
+        dataset.order_ids += [order["id"] for order in body["orders"]]
+
+
+# ============== ESCENARIOS ==============
+# Cada tipo devuelve la secuencia de peticiones (método, ruta, body) de una
+# iteración; la latencia se mide por petición.
+
+def search_as_you_type(dataset, rng, params):
+    """Búsqueda incremental: una petición por cada letra tecleada"""
+    term = rng.choice(dataset.search_terms)
+    endpoint = params.get("endpoint", "/api/users")
+    min_chars = params.get("min_chars", 2)
+    max_chars = min(len(term), params.get("max_chars", 6))
+    for length in range(min_chars, max_chars + 1):
+        query = urllib.parse.urlencode({"search": term[:length], "per_page": params.get("per_page", 10)})
+        yield "GET", f"{endpoint}?{query}", None
+
+
+def paging(dataset, rng, params):
+    """Recorre las primeras páginas de un listado"""
+    endpoint = params.get("endpoint", "/api/orders")
+    if "{user_id}" in endpoint:
+        endpoint = endpoint.format(user_id=rng.choice(dataset.user_ids))
+    query = {"per_page": params.get("per_page", 10)}
+    if params.get("status"):
+        query["status"] = params["status"]
+    for page in range(1, params.get("pages", 3) + 1):
+        yield "GET", f"{endpoint}?{urllib.parse.urlencode({'page': page, **query})}", None
+
+
+def export(dataset, rng, params):
+    query = {"format": params.get("format", "json")}
+    if params.get("by_user"):
+        query["user_id"] = rng.choice(dataset.user_ids)
+    yield "GET", f"{params.get('endpoint', '/api/orders/export')}?{urllib.parse.urlencode(query)}", None
+
+
+def batch_upload(dataset, rng, params):
+    size = params.get("size", 100)
+    if params.get("entity", "orders") == "users":
+        yield "POST", "/api/users/batch", {"users": dataset.generate_users(size, rng)}
+    else:
+        yield "POST", "/api/orders/batch", {"orders": dataset.generate_orders(size, rng)}
+
+
+def status_patch(dataset, rng, params):
+    order_id = rng.choice(dataset.order_ids)
+    yield "PATCH", f"/api/orders/{order_id}", {"status": rng.choice(ORDER_STATUSES)}
+
+
+def claim(dataset, rng, params):
+    """Un worker de la cola reservando los siguientes pedidos pendientes"""
+    worker = f"loadtest-{rng.randrange(params.get('workers', 4))}"
+    yield "POST", "/api/orders/claim", {
+        "worker": worker,
+        "limit": params.get("limit", 10),
+        "lease_seconds": params.get("lease_seconds", 5)
+    }
+
+
+SCENARIO_TYPES = {
+    "search_as_you_type": search_as_you_type,
+    "paging": paging,
+    "export": export,
+    "batch_upload": batch_upload,
+    "status_patch": status_patch,
+    "claim": claim,
+}
+
+
+# ============== EJECUCIÓN ==============
+
+class ScenarioStats:
+
+    def __init__(self):
+        self.latencies = []
+        self.queries = []
+        self.errors = 0
+        self.statuses = {}
+        self._lock = threading.Lock()
+
+    def add(self, status, elapsed, queries):
+        with self._lock:
+            self.latencies.append(elapsed)
+            if queries is not None:
+                self.queries.append(queries)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if status == 0 or status >= 400:
+                self.errors += 1
+
+    @property
+    def requests(self):
+        return len(self.latencies)
+
+    @property
+    def error_rate(self):
+        return self.errors / self.requests if self.requests else 0.0
+
+    def percentile_ms(self, percent):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        # Percentil por rango más cercano
+        rank = max(1, math.ceil(percent / 100 * len(ordered)))
+        return ordered[rank - 1] * 1000
+
+    def queries_mean(self):
+        return sum(self.queries) / len(self.queries) if self.queries else None
+
+    def queries_max(self):
+        return max(self.queries) if self.queries else None
+
+
+def worker(client, dataset, scenarios, stats, deadline, seed_value):
+    rng = random.Random(seed_value)
+    weights = [scenario["weight"] for scenario in scenarios]
+    while time.monotonic() < deadline:
+        scenario = rng.choices(scenarios, weights=weights)[0]
+        generate = SCENARIO_TYPES[scenario["type"]]
+        for method, path, body in generate(dataset, rng, scenario.get("params", {})):
+            status, elapsed, queries, _ = client.request(method, path, body)
+            stats[scenario["name"]].add(status, elapsed, queries)
+
+
+def run(client, dataset, scenarios, duration, concurrency, seed_value):
+    stats = {scenario["name"]: ScenarioStats() for scenario in scenarios}
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(target=worker, args=(
+            client, dataset, scenarios, stats, deadline, seed_value + index))
+        for index in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats
+
+
+def scenario_slo(scenario, overrides):
+    """Umbrales del escenario con los de `overrides` aplicados (null los quita)"""
+    slo = dict(scenario.get("slo", {}))
+    if overrides:
+        slo.update(scenario.get(overrides, {}))
+    return {key: limit for key, limit in slo.items() if limit is not None}
+
+
+def check_slo(slo, stats):
+    """Returns: lista de incumplimientos del SLO del escenario"""
+    breaches = []
+    for key, limit in slo.items():
+        if key.endswith("_ms") and key.startswith("p"):
+            value = stats.percentile_ms(float(key[1:-3]))
+            if value > limit:
+                breaches.append(f"{key} {value:.1f} > {limit}")
+        elif key == "max_error_rate":
+            if stats.error_rate > limit:
+                breaches.append(f"error rate {stats.error_rate:.2%} > {limit:.2%}")
+        elif key == "max_queries":
+            value = stats.queries_max()
+            if value is not None and value > limit:
+                breaches.append(f"queries/request {value} > {limit}")
+        elif key == "min_requests":
+            if stats.requests < limit:
+                breaches.append(f"requests {stats.requests} < {limit}")
+        else:
+            breaches.append(f"unknown SLO key '{key}'")
+    return breaches
+
+
+def report(scenarios, stats, duration, slo_overrides=None):
+    print(f"{'scenario':<22}{'reqs':>7}{'req/s':>8}{'err%':>7}{'p50':>9}{'p95':>9}"
+          f"{'p99':>9}{'max':>9}{'q avg':>7}{'q max':>7}")
+    failed = False
+    for scenario in scenarios:
+        result = stats[scenario["name"]]
+        queries_mean = result.queries_mean()
+        queries = (f"{queries_mean:>7.1f}{result.queries_max():>7}"
+                   if queries_mean is not None else f"{'-':>7}{'-':>7}")
+        print(f"{scenario['name']:<22}{result.requests:>7}{result.requests / duration:>8.1f}"
+              f"{result.error_rate * 100:>7.2f}"
+              f"{result.percentile_ms(50):>9.1f}{result.percentile_ms(95):>9.1f}"
+              f"{result.percentile_ms(99):>9.1f}{result.percentile_ms(100):>9.1f}"
+              f"{queries}")
+        breaches = check_slo(scenario_slo(scenario, slo_overrides), result)
+        for breach in breaches:
+            print(f"  SLO FAILED: {breach}")
+        unexpected = {status: count for status, count in result.statuses.items()
+                      if status == 0 or status >= 400}
+        if unexpected:
+            print(f"  errors by status: {unexpected}")
+        failed = failed or bool(breaches)
+    print("\nLatencias en ms; q = consultas SQL por petición")
+    return failed
+
+
+def load_scenarios(path, only):
+    with open(path, encoding="utf-8") as file:
+        config = json.load(file)
+    scenarios = config["scenarios"]
+    if only:
+        scenarios = [scenario for scenario in scenarios if scenario["name"] in only]
+        if not scenarios:
+            raise SystemExit(f"Ningún escenario coincide con {', '.join(only)}")
+    for scenario in scenarios:
+        if scenario["type"] not in SCENARIO_TYPES:
+            raise SystemExit(
+                f"Tipo de escenario desconocido '{scenario['type']}' en {scenario['name']}")
+    return config, scenarios
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scenarios", default=DEFAULT_SCENARIOS)
+    parser.add_argument("--only", action="append", help="ejecutar solo este escenario (repetible)")
+    parser.add_argument("--duration", type=float, help="segundos (por defecto, el del fichero)")
+    parser.add_argument("--concurrency", type=int, help="hilos (por defecto, el del fichero)")
+    parser.add_argument("--base-url", help="URL de una instancia en marcha en lugar de la app en proceso")
+    parser.add_argument("--no-seed", action="store_true", help="no crear datos, usar los existentes")
+    parser.add_argument("--random-seed", type=int, default=1)
+    args = parser.parse_args()
+
+    config, scenarios = load_scenarios(args.scenarios, args.only)
+    duration = args.duration or config.get("duration", 30)
+    concurrency = args.concurrency or config.get("concurrency", 8)
+    rng = random.Random(args.random_seed)
+    dataset = Dataset()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.base_url:
+            client = HttpClient(args.base_url)
+        else:
+            client = InProcessClient(os.path.join(tmp_dir, "loadtest.db"))
+
+        if not args.no_seed:
+            seed_config = config.get("seed", {})
+            seed(client, dataset, seed_config.get("users", 300), seed_config.get("orders", 3000), rng)
+        else:
+            dataset.load_ids(client)
+        if not dataset.user_ids or not dataset.order_ids:
+            raise SystemExit("No hay usuarios o pedidos con los que lanzar la carga")
+
+        print(f"{len(scenarios)} escenarios, {concurrency} hilos, {duration:.0f} s, "
+              f"{len(dataset.user_ids)} usuarios y {len(dataset.order_ids)} pedidos\n")
+        stats = run(client, dataset, scenarios, duration, concurrency, args.random_seed)
+
+    failed = report(scenarios, stats, duration, client.slo_overrides)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
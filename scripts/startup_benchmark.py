@@ -0,0 +1,86 @@
+"""
+Benchmark de arranque de la aplicación.
+Ejecuta `python -X importtime` en un proceso nuevo por cada repetición y
+reporta el tiempo total de imports, el tiempo hasta tener la app creada y
+los módulos de mayor coste acumulado.
+
+Uso (desde la raíz del repositorio):
+    python scripts/startup_benchmark.py                # como un worker de gunicorn
+    python scripts/startup_benchmark.py --target cli   # como el CLI de flask
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+TARGETS = {
+    "wsgi": "import time; t = time.perf_counter(); import wsgi; "
+            "print(time.perf_counter() - t)",
+    "cli": "import time; t = time.perf_counter(); import app; app.create_app(); "
+           "print(time.perf_counter() - t)",
+}
+
+
+def parse_importtime(stderr):
+    """
+    Lee la salida de -X importtime.
+    Returns: (total en microsegundos, {módulo: acumulado en microsegundos})
+    """
+    total = 0
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        module = name.rstrip()
+        depth = (len(module) - len(module.lstrip())) // 2
+        module = module.strip()
+        cumulative[module] = int(cumulative_us)
+        # Solo los imports de primer nivel suman al total
+        if depth == 0:
+            total += int(cumulative_us)
+    return total, cumulative
+
+
+def run_once(target, env):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", TARGETS[target]],
+        cwd=SRC_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    total, cumulative = parse_importtime(result.stderr)
+    create_seconds = float(result.stdout.strip().splitlines()[-1])
+    return total, create_seconds, cumulative
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--target", choices=TARGETS, default="wsgi")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+    totals, creates, last_cumulative = [], [], {}
+    for _ in range(args.runs):
+        total, create_seconds, last_cumulative = run_once(args.target, env)
+        totals.append(total / 1000)
+        creates.append(create_seconds * 1000)
+
+    print(f"target: {args.target}  runs: {args.runs}")
+    print(f"import time total (-X importtime): median {statistics.median(totals):.1f} ms, "
+          f"min {min(totals):.1f} ms")
+    print(f"import + create_app wall time:     median {statistics.median(creates):.1f} ms, "
+          f"min {min(creates):.1f} ms")
+    print(f"\ntop {args.top} modules by cumulative import time (last run):")
+    ranked = sorted(last_cumulative.items(), key=lambda item: item[1], reverse=True)
+    for module, micros in ranked[:args.top]:
+        print(f"  {micros / 1000:8.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,207 @@
-  
 import os
+from flask import flash, g
 from flask_admin import Admin
-from .models import db, User
+from flask_admin.actions import action
 from flask_admin.contrib.sqla import ModelView
+from wtforms import HiddenField
+from wtforms.validators import AnyOf
+from sqlalchemy import BigInteger, cast, func, literal_column, select, text, update
+from sqlalchemy.orm import joinedload
+from .events import broker
+from .models import (
+    db, User, Order, ORDER_STATUSES, bump_version, record_changes, refresh_order_summaries
+)
+from .soft_delete import soft_delete_users, soft_delete_orders
+
+
+class ScalableModelView(ModelView):
+    """
+    ModelView pensada para tablas grandes: páginas cortas, orden por defecto
+    sobre columnas indexadas y, sin búsqueda ni filtros, un total aproximado
+    en lugar de un COUNT(*) sobre toda la tabla.
+    """
+    page_size = 50
+    can_set_page_size = True
+    approximate_row_count = True
+
+    def get_list(self, page, sort_column, sort_desc, search, filters,
+                 execute=True, page_size=None):
+        # Con búsqueda o filtros el total tiene que ser exacto
+        g.admin_exact_count = bool(search or filters)
+        return super().get_list(page, sort_column, sort_desc, search, filters,
+                                execute=execute, page_size=page_size)
+
+    def get_count_query(self):
+        if not self.approximate_row_count or g.get("admin_exact_count", True):
+            return super().get_count_query()
+        return approximate_count_query(self.session, self.model)
+
+
+def approximate_count_query(session, model):
+    """
+    Total aproximado de filas sin recorrer la tabla: en Postgres las
+    estadísticas del planner (pg_class.reltuples), con COUNT(*) si la tabla
+    aún no se ha analizado; en el resto, el mayor id (índice de la PK).
+    """
+    table = model.__table__.name
+    if session.get_bind().dialect.name == "postgresql":
+        return session.query(literal_column(
+            f'CASE WHEN reltuples >= 0 THEN reltuples::bigint '
+            f'ELSE (SELECT count(*) FROM "{table}") END'
+        )).select_from(text("pg_class")).filter(
+            text("oid = CAST(:table AS regclass)")).params(table=f'"{table}"')
+    return session.query(cast(func.coalesce(func.max(model.id), 0), BigInteger))
+
+
+class VersionedModelView(ScalableModelView):
+    """
+    Control de concurrencia optimista en la edición: el formulario lleva la
+    versión que se leyó y no se guarda si otra edición la cambió entretanto.
+    Las subclases incluyen "version" en form_columns.
+    """
+    form_extra_fields = {"version": HiddenField()}
+
+    def create_model(self, form):
+        del form.version
+        return super().create_model(form)
+
+    def update_model(self, form, model):
+        if form.version.data and form.version.data != str(model.version):
+            flash("This record was changed by someone else while you were editing it. "
+                  "Reload it and apply your changes again.", "error")
+            return False
+        # La versión la sube SQLAlchemy (version_id_col), no el formulario
+        del form.version
+        return super().update_model(form, model)
+
+
+class UserAdmin(VersionedModelView):
+    # El resumen de pedidos se muestra desde las columnas de User, sin tocar
+    # la relación orders ni en el listado ni en el formulario
+    column_list = ("id", "name", "email", "created_at", "order_count",
+                   "order_total", "last_order_at")
+    column_default_sort = ("created_at", True)
+    column_sortable_list = ("id", "name", "email", "created_at")
+    column_searchable_list = ("name", "email")
+    column_filters = ("created_at",)
+    form_columns = ("name", "email", "version")
+
+    def on_model_change(self, form, model, is_created):
+        # El change log se escribe en la transacción que confirma Flask-Admin
+        db.session.flush()
+        record_changes("user", [model.id], "created" if is_created else "updated")
+
+    def delete_model(self, model):
+        # Borrado lógico, igual que DELETE /api/users/<id>
+        soft_delete_users([model.id])
+        db.session.commit()
+        return True
+
+    @action("delete", "Delete", "Delete the selected users and their orders?")
+    def action_delete(self, ids):
+        user_ids, order_ids = soft_delete_users(int(user_id) for user_id in ids)
+        db.session.commit()
+        flash(f"{len(user_ids)} users and {len(order_ids)} orders deleted")
+
+
+class OrderAdmin(VersionedModelView):
+    # 'user' en column_list hace que Flask-Admin lo cargue con joinedload
+    column_list = ("id", "user", "product_name", "amount", "status", "created_at")
+    column_default_sort = ("created_at", True)
+    column_sortable_list = ("id", "status", "created_at")
+    column_searchable_list = ("product_name",)
+    column_filters = ("status", "created_at", "user_id")
+    column_choices = {"status": [(status, status) for status in ORDER_STATUSES]}
+    form_args = {"status": {"validators": [AnyOf(ORDER_STATUSES)]}}
+    # Buscar el usuario por AJAX en lugar de cargar todos en un <select>
+    form_ajax_refs = {"user": {"fields": ("name", "email"), "page_size": 10}}
+    form_columns = ("user", "product_name", "amount", "status", "version")
+
+    def on_model_change(self, form, model, is_created):
+        # El formulario puede mover el pedido a otro usuario: se recalculan
+        # los resúmenes del anterior y del nuevo y se escribe el change log,
+        # todo en la transacción que confirma Flask-Admin
+        user_ids = set()
+        g.admin_previous_status = None
+        if not is_created:
+            with db.session.no_autoflush:
+                previous_user_id, g.admin_previous_status = db.session.execute(
+                    select(Order.user_id, Order.status).where(Order.id == model.id)).one()
+            user_ids.add(previous_user_id)
+        db.session.flush()
+        user_ids.add(model.user_id)
+        refresh_order_summaries(user_ids)
+        record_changes("order", [model.id], "created" if is_created else "updated")
+
+    def after_model_change(self, form, model, is_created):
+        # Ya confirmado: avisar a los clientes del stream como las rutas de la API
+        if is_created:
+            broker.publish("order.created", model.serialize())
+        elif g.admin_previous_status != model.status:
+            broker.publish("order.status_changed", {
+                **model.serialize(), "previous_status": g.admin_previous_status})
+
+    def delete_model(self, model):
+        soft_delete_orders([model.id])
+        db.session.commit()
+        return True
+
+    def _set_status(self, ids, status):
+        """
+        Cambia el estado con un único UPDATE, recalcula los resúmenes afectados
+        y, tras el commit, publica order.status_changed de cada pedido cambiado
+        """
+        order_ids = [int(order_id) for order_id in ids]
+        previous = db.session.execute(
+            select(Order.id, Order.user_id, Order.status)
+            .where(Order.id.in_(order_ids), Order.status != status)
+        ).all()
+        changed_ids = db.session.execute(
+            update(Order)
+            .where(Order.id.in_([row.id for row in previous]), Order.status != status,
+                   Order.deleted_at.is_(None))
+            .values(status=status, **bump_version(Order))
+            .returning(Order.id)
+        ).scalars().all()
+        refresh_order_summaries({row.user_id for row in previous})
+        record_changes("order", changed_ids, "updated")
+        db.session.commit()
+
+        previous_statuses = {row.id: row.status for row in previous}
+        orders = Order.query.options(joinedload(Order.user)).filter(
+            Order.id.in_(changed_ids)).all() if changed_ids else []
+        for order in orders:
+            broker.publish("order.status_changed", {
+                **order.serialize(), "previous_status": previous_statuses[order.id]})
+        flash(f"{len(changed_ids)} orders marked as {status}")
+
+    @action("mark_pending", "Mark as pending")
+    def action_mark_pending(self, ids):
+        self._set_status(ids, "pending")
+
+    @action("mark_completed", "Mark as completed")
+    def action_mark_completed(self, ids):
+        self._set_status(ids, "completed")
+
+    @action("mark_cancelled", "Mark as cancelled")
+    def action_mark_cancelled(self, ids):
+        self._set_status(ids, "cancelled")
+
+    @action("delete", "Delete", "Delete the selected orders?")
+    def action_delete(self, ids):
+        order_ids = soft_delete_orders(int(order_id) for order_id in ids)
+        db.session.commit()
+        flash(f"{len(order_ids)} orders deleted")
+
 
 def setup_admin(app):
     app.secret_key = os.environ.get('FLASK_APP_KEY', 'sample key')
     app.config['FLASK_ADMIN_SWATCH'] = 'cerulean'
     admin = Admin(app, name='4Geeks Admin', template_mode='bootstrap3')
 
-    
     # Add your models here, for example this is how we add a the User model to the admin
-    admin.add_view(ModelView(User, db.session))
+    admin.add_view(UserAdmin(User, db.session))
+    admin.add_view(OrderAdmin(Order, db.session))
 
     # You can duplicate that line to add mew models
-    # admin.add_view(ModelView(YourModelName, db.session))
\ No newline at end of file
+    # admin.add_view(ModelView(YourModelName, db.session))
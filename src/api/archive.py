@@ -0,0 +1,156 @@
+"""
+Archivo de pedidos antiguos.
+Los pedidos completados o cancelados con más de N días se mueven de 'order'
+a 'archived_order'. Las rutas de lectura solo los incluyen si se pide
+explícitamente con ?include_archived=1, mediante un UNION ALL de ambas tablas.
+"""
+from datetime import timedelta
+
+from sqlalchemy import delete, func, insert, literal, select, union_all, update
+
+from api.models import db, User, Order, ArchivedOrder, record_changes
+from api.utils import utcnow
+
+ARCHIVABLE_STATUSES = ("completed", "cancelled")
+
+
+def wants_archived(args):
+    """Interpreta el parámetro include_archived de la query string"""
+    return args.get('include_archived', '').lower() in ('1', 'true', 'yes')
+
+
+def archive_orders(cutoff, batch_size=1000):
+    """
+    Mueve a archived_order los pedidos archivables creados antes de `cutoff`,
+    en lotes de `batch_size` filas con una transacción por lote.
+    Returns: número total de pedidos archivados
+    """
+    archived = 0
+    while True:
+        ids = db.session.execute(
+            select(Order.id)
+            .where(Order.status.in_(ARCHIVABLE_STATUSES), Order.created_at < cutoff)
+            .order_by(Order.id)
+            .limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            break
+
+        columns = ["id", "user_id", "product_name", "amount", "status", "created_at"]
+        db.session.execute(
+            insert(ArchivedOrder).from_select(
+                columns,
+                select(*(getattr(Order, column) for column in columns))
+                .where(Order.id.in_(ids))
+            )
+        )
+
+        # Mantener el contador de archivados del resumen de cada usuario
+        per_user = db.session.execute(
+            select(Order.user_id, func.count(Order.id))
+            .where(Order.id.in_(ids))
+            .group_by(Order.user_id)
+        ).all()
+        for user_id, count in per_user:
+            db.session.execute(
+                update(User).where(User.id == user_id).values(
+                    archived_order_count=User.archived_order_count + count))
+
+        db.session.execute(delete(Order).where(Order.id.in_(ids)))
+        record_changes("order", ids, "archived")
+        db.session.commit()
+        archived += len(ids)
+
+    return archived
+
+
+def archive_cutoff(days):
+    """Fecha límite para archivar pedidos con más de `days` días"""
+    return utcnow() - timedelta(days=days)
+
+
+def _order_columns(model, archived):
+    return select(
+        model.id,
+        model.user_id,
+        model.product_name,
+        model.amount,
+        model.status,
+        model.created_at,
+        literal(archived).label("archived")
+    )
+
+
+def orders_with_archive(criteria):
+    """
+    Pedidos activos y archivados como una sola subconsulta (UNION ALL).
+    `criteria(model)` devuelve los filtros a aplicar en cada tabla, de forma
+    que se empujan dentro de cada rama del UNION y pueden usar sus índices.
+    """
+    return union_all(
+        _order_columns(Order, False).where(*criteria(Order)),
+        _order_columns(ArchivedOrder, True).where(*criteria(ArchivedOrder)),
+    ).subquery()
+
+
+def _ordered_rows(combined):
+    return (
+        select(combined, User.name.label("user_name"))
+        .join(User, User.id == combined.c.user_id)
+        .order_by(combined.c.created_at.desc(), combined.c.id.desc())
+    )
+
+
+def order_rows_statement(criteria, include_archived=False):
+    """
+    SELECT de filas planas de pedidos (sin cargar objetos ORM), con las mismas
+    columnas tanto si se incluyen archivados como si no. Lo usan los exports.
+    """
+    if include_archived:
+        return _ordered_rows(orders_with_archive(criteria))
+    return (
+        _order_columns(Order, False)
+        .add_columns(User.name.label("user_name"))
+        .join(User, User.id == Order.user_id)
+        .where(*criteria(Order))
+        .order_by(Order.created_at.desc(), Order.id.desc())
+    )
+
+
+def paginate_orders_with_archive(criteria, page, per_page, with_total=True):
+    """
+    Returns: (pedidos serializados de la página, total). Con with_total=False
+    no se ejecuta el COUNT(*) del UNION y el total es None.
+    """
+    combined = orders_with_archive(criteria)
+    total = None
+    if with_total:
+        # Con el mismo JOIN a User que las filas: los pedidos (archivados) de
+        # usuarios borrados no se devuelven, así que tampoco cuentan
+        total = db.session.execute(
+            select(func.count()).select_from(combined)
+            .join(User, User.id == combined.c.user_id)).scalar()
+    rows = db.session.execute(
+        _ordered_rows(combined).limit(per_page).offset((page - 1) * per_page)
+    ).all()
+    return [serialize_order_row(row) for row in rows], total
+
+
+def all_orders_with_archive(criteria):
+    """Returns: todos los pedidos serializados que cumplen los filtros"""
+    rows = db.session.execute(_ordered_rows(orders_with_archive(criteria))).all()
+    return [serialize_order_row(row) for row in rows]
+
+
+def serialize_order_row(row):
+    """Mismo formato que Order.serialize() más el indicador 'archived'"""
+    return {
+        "id": row.id,
+        "user_id": row.user_id,
+        "product_name": row.product_name,
+        "amount": row.amount,
+        "status": row.status,
+        "created_at": row.created_at.isoformat(),
+        "user_name": row.user_name,
+        "archived": bool(row.archived)
+    }
@@ -0,0 +1,99 @@
+"""
+Lectura del change log para GET /api/changes.
+El token de sincronización es "<txid>.<id>", la posición de la última fila
+entregada en orden (txid, id). En Postgres solo se entregan filas de
+transacciones anteriores al xmin del snapshot (ya terminadas): las filas de
+una transacción en curso aparecen al confirmar, con un txid mayor que el del
+token ya entregado, aunque sus ids sean más bajos. Una transacción abierta
+mucho tiempo retrasa el feed hasta que termina, pero no se pierde nada.
+En SQLite las escrituras son serializadas y txid es siempre 0.
+"""
+import re
+
+from sqlalchemy import BigInteger, Integer, delete, func, literal, select, tuple_
+
+from api.models import db, ChangeLog
+
+START = (0, 0)
+TOKEN = re.compile(r"^(\d+)\.(\d+)$")
+
+
+def parse_token(value):
+    """
+    Token `since` de la query string; "0" o vacío es una sincronización completa.
+    Returns: (txid, id) o None si no es válido
+    """
+    value = (value or "0").strip()
+    if value == "0":
+        return START
+    match = TOKEN.match(value)
+    if not match:
+        return None
+    return int(match.group(1)), int(match.group(2))
+
+
+def format_token(position):
+    txid, change_id = position
+    return f"{txid}.{change_id}"
+
+
+def position_key():
+    return tuple_(ChangeLog.txid, ChangeLog.id)
+
+
+def position_value(position):
+    """(txid, id) como valor SQL, con txid BIGINT (no cabe en INTEGER)"""
+    txid, change_id = position
+    return tuple_(literal(txid, BigInteger), literal(change_id, Integer))
+
+
+def finished_transactions():
+    """Filtro de las filas escritas por transacciones que ya han terminado"""
+    if db.session.get_bind().dialect.name != "postgresql":
+        return []
+    return [ChangeLog.txid < func.txid_snapshot_xmin(func.txid_current_snapshot())]
+
+
+def needs_resync(since):
+    """
+    True si el token es anterior a lo que conserva el log: purge-change-log
+    borró entradas posteriores a él y el cliente debe sincronizar desde 0
+    """
+    if since == START:
+        return False
+    oldest = db.session.execute(
+        select(ChangeLog.txid, ChangeLog.id)
+        .order_by(ChangeLog.txid, ChangeLog.id)
+        .limit(1)
+    ).first()
+    return oldest is not None and since < tuple(oldest)
+
+
+def changes_since(since, limit):
+    """
+    Returns: (hasta `limit` entradas posteriores a `since`, hay más)
+    """
+    changes = ChangeLog.query.filter(
+        position_key() > position_value(since), *finished_transactions()
+    ).order_by(ChangeLog.txid, ChangeLog.id).limit(limit + 1).all()
+    return changes[:limit], len(changes) > limit
+
+
+def purge_change_log(cutoff):
+    """
+    Elimina las entradas anteriores a `cutoff`, conservando la más reciente
+    de ellas: marca hasta dónde llega el log y los tokens que ya la alcanzaron
+    siguen siendo válidos (ver needs_resync).
+    Returns: número de entradas eliminadas
+    """
+    boundary = db.session.execute(
+        select(ChangeLog.txid, ChangeLog.id)
+        .where(ChangeLog.changed_at < cutoff)
+        .order_by(ChangeLog.txid.desc(), ChangeLog.id.desc())
+        .limit(1)
+    ).first()
+    if boundary is None:
+        return 0
+    result = db.session.execute(
+        delete(ChangeLog).where(position_key() < position_value(boundary)))
+    return result.rowcount
@@ -1,6 +1,12 @@
 
 import click
-from api.models import db, User
+from datetime import timedelta
+from api.models import db, User, refresh_order_summaries
+from api.change_feed import purge_change_log as purge_change_log_entries
+from api.idempotency import purge_expired_keys
+from api.utils import utcnow
+from api.archive import archive_orders as move_orders_to_archive, archive_cutoff
+from api.soft_delete import purge_deleted as purge_deleted_rows, purge_cutoff
 
 """
 In this file, you can add as many commands as you want using the @app.cli.command decorator
@@ -31,4 +37,64 @@ def setup_commands(app):
 
     @app.cli.command("insert-test-data")
     def insert_test_data():
-        pass
\ No newline at end of file
+        pass
+
+    """
+    Elimina las claves de idempotencia caducadas. La API ya hace esta limpieza
+    periódicamente, pero se puede programar como cronjob:
+    $ flask purge-idempotency-keys
+    """
+    @app.cli.command("purge-idempotency-keys")
+    def purge_idempotency_keys():
+        deleted = purge_expired_keys()
+        print("Expired idempotency keys deleted:", deleted)
+
+    """
+    Recalcula el resumen de pedidos de todos los usuarios a partir de la tabla
+    de pedidos, por si se han modificado pedidos fuera de la API:
+    $ flask rebuild-order-summaries
+    """
+    @app.cli.command("rebuild-order-summaries")
+    def rebuild_order_summaries():
+        refresh_order_summaries()
+        db.session.commit()
+        print("Order summaries rebuilt")
+
+    """
+    Elimina las entradas del change log anteriores a N días (por defecto 30).
+    GET /api/changes responde 410 a los tokens más antiguos, que deben volver
+    a sincronizar desde 0:
+    $ flask purge-change-log --days 30
+    """
+    @app.cli.command("purge-change-log")
+    @click.option("--days", default=30, type=int)
+    def purge_change_log(days):
+        deleted = purge_change_log_entries(utcnow() - timedelta(days=days))
+        db.session.commit()
+        print("Change log entries deleted:", deleted)
+
+    """
+    Mueve los pedidos completados o cancelados con más de N días (por defecto 90)
+    a la tabla archived_order, en lotes, para que los listados solo recorran
+    pedidos recientes. Pensado para ejecutarse como cronjob nocturno:
+    $ flask archive-orders --days 90 --batch-size 1000
+    """
+    @app.cli.command("archive-orders")
+    @click.option("--days", default=90, type=int)
+    @click.option("--batch-size", default=1000, type=int)
+    def archive_orders(days, batch_size):
+        archived = move_orders_to_archive(archive_cutoff(days), batch_size)
+        print("Orders archived:", archived)
+
+    """
+    Elimina definitivamente, en lotes, los usuarios y pedidos borrados
+    (borrado lógico) hace más de N días (por defecto 30):
+    $ flask purge-deleted --days 30 --batch-size 1000
+    """
+    @app.cli.command("purge-deleted")
+    @click.option("--days", default=30, type=int)
+    @click.option("--batch-size", default=1000, type=int)
+    def purge_deleted(days, batch_size):
+        orders, users = purge_deleted_rows(purge_cutoff(days), batch_size)
+        print("Deleted orders purged:", orders)
+        print("Deleted users purged:", users)
@@ -0,0 +1,97 @@
+"""
+Compresión gzip/brotli negociada de las respuestas de la API.
+Se registra como after_request del blueprint `api`: las respuestas normales
+se comprimen de una vez si superan COMPRESSION_MIN_SIZE, y las respuestas en
+streaming (exports Arrow) se comprimen bloque a bloque sin acumularlas.
+"""
+import gzip
+import zlib
+
+from flask import current_app, request
+
+from api.utils import negotiate_encoding
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Parquet ya va comprimido y text/event-stream no debe esperar a llenar bloques
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/vnd.apache.arrow.stream",
+    "text/csv",
+    "text/html",
+    "text/plain",
+}
+
+
+def available_encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def compress(data, encoding, level):
+    if encoding == "br":
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def compress_stream(chunks, encoding, level):
+    """Comprime un iterable de bloques manteniendo el envío en streaming"""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=level)
+        for chunk in chunks:
+            data = compressor.process(_as_bytes(chunk)) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31 = formato gzip
+        for chunk in chunks:
+            data = compressor.compress(_as_bytes(chunk)) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
+
+
+def _as_bytes(chunk):
+    return chunk.encode() if isinstance(chunk, str) else chunk
+
+
+def compress_response(response):
+    """after_request: comprime la respuesta si el cliente lo acepta y compensa"""
+    config = current_app.config
+    if not config.get("COMPRESSION_ENABLED", True):
+        return response
+    if request.method == "HEAD" or response.status_code < 200 \
+            or response.status_code in (204, 304):
+        return response
+    if "Content-Encoding" in response.headers \
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate_encoding(request.accept_encodings, available_encodings())
+    if encoding is None:
+        return response
+
+    if encoding == "br":
+        level = config.get("COMPRESSION_BROTLI_QUALITY", 4)
+    else:
+        level = config.get("COMPRESSION_GZIP_LEVEL", 6)
+
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding, level)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < config.get("COMPRESSION_MIN_SIZE", 1024):
+            return response
+        response.set_data(compress(data, encoding, level))
+
+    response.headers["Content-Encoding"] = encoding
+    # El ETag identifica la representación: distinto por codificación
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak=weak)
+    return response
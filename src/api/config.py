@@ -0,0 +1,122 @@
+"""
+Configuración por entorno para create_app().
+Cada clase agrupa las opciones de la BD (engine y pool) y del resto de
+módulos; los valores por defecto se pueden sobrescribir con variables de entorno.
+"""
+import os
+import tempfile
+
+
+def database_url(default="sqlite:////tmp/test.db"):
+    """DATABASE_URL con el esquema que espera SQLAlchemy (postgresql://)"""
+    db_url = os.getenv("DATABASE_URL")
+    if db_url is None:
+        return default
+    return db_url.replace("postgres://", "postgresql://")
+
+
+def engine_options(uri):
+    """
+    Opciones del engine. El tamaño del pool solo aplica a servidores de BD:
+    SQLite en memoria usa un pool de conexión única que no las admite.
+    """
+    options = {"pool_pre_ping": True}
+    if not uri.startswith("sqlite"):
+        options.update({
+            "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
+            "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 10)),
+            "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", 30)),
+            "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+        })
+    return options
+
+
+class Config:
+    SQLALCHEMY_DATABASE_URI = database_url()
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # 0 para no cargar Flask-Admin (arranque más rápido en workers que no lo usan)
+    ENABLE_ADMIN = os.getenv("ENABLE_ADMIN", "1") == "1"
+
+    # idempotency keys: tiempo de vida (segundos) y cada cuánto se purgan las caducadas
+    IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", 24 * 60 * 60))
+    IDEMPOTENCY_CLEANUP_INTERVAL = int(
+        os.getenv("IDEMPOTENCY_CLEANUP_INTERVAL", 5 * 60))
+    IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", 10))
+    # segundos que una petición en curso retiene su clave; después un reintento
+    # la recupera (mayor que el timeout de gunicorn, que mata al worker a los 30)
+    IDEMPOTENCY_LOCK_TIMEOUT = int(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT", 60))
+
+    # server-sent events: segundos entre keep-alives de /api/orders/stream y
+    # conexiones abiertas a la vez por proceso. Cada una ocupa un hilo de
+    # gunicorn, así que debe quedar por debajo de GUNICORN_THREADS para que
+    # el resto de peticiones tengan hilos libres; por encima responde 503
+    EVENTS_HEARTBEAT_INTERVAL = int(os.getenv("EVENTS_HEARTBEAT_INTERVAL", 15))
+    EVENTS_MAX_STREAMS = int(os.getenv(
+        "EVENTS_MAX_STREAMS", max(1, int(os.getenv("GUNICORN_THREADS", 4)) // 2)))
+
+    # exports parquet/arrow: filas leídas de la BD por cada RecordBatch
+    EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", 5000))
+
+    # cola de pedidos: segundos que dura la reserva de POST /api/orders/claim
+    # (por defecto y máximo); al caducar, otro worker puede reservar el pedido
+    ORDER_CLAIM_LEASE_SECONDS = int(os.getenv("ORDER_CLAIM_LEASE_SECONDS", 300))
+    ORDER_CLAIM_MAX_LEASE_SECONDS = int(os.getenv("ORDER_CLAIM_MAX_LEASE_SECONDS", 3600))
+
+    # compresión gzip/brotli de las respuestas de /api
+    COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "1") == "1"
+    COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+    COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4))
+
+    # rate limiting: (peticiones/segundo por cliente, ráfaga, concurrentes por ruta)
+    RATELIMIT_ENABLED = os.getenv("RATELIMIT_ENABLED", "1") == "1"
+    RATE_LIMITS = {
+        "export": (float(os.getenv("RATELIMIT_EXPORT_RATE", 0.2)), 3, 2),
+        "batch": (float(os.getenv("RATELIMIT_BATCH_RATE", 1)), 5, 4),
+        "search": (float(os.getenv("RATELIMIT_SEARCH_RATE", 10)), 20, 8),
+    }
+    # backend compartido entre workers ("paquete.modulo:Clase"); vacío = memoria del proceso
+    RATELIMIT_BACKEND = os.getenv("RATELIMIT_BACKEND", "")
+
+    # proxies delante de la app (balanceador de Render, nginx...): saltos de
+    # X-Forwarded-For en los que se confía para obtener la IP del cliente.
+    # 0 = la app recibe las conexiones directamente y se ignora la cabecera
+    TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", 0))
+
+    # profiling bajo demanda (api/profiling.py): sin PROFILING_SECRET no se instala
+    PROFILING_SECRET = os.getenv("PROFILING_SECRET", "")
+    PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 0))
+    PROFILING_INTERVAL = float(os.getenv("PROFILING_INTERVAL", 0.005))
+    PROFILING_MAX_SECONDS = int(os.getenv("PROFILING_MAX_SECONDS", 30))
+    PROFILING_DIR = os.getenv(
+        "PROFILING_DIR", os.path.join(tempfile.gettempdir(), "api-profiles"))
+    PROFILING_MAX_PROFILES = int(os.getenv("PROFILING_MAX_PROFILES", 100))
+
+
+class DevelopmentConfig(Config):
+    # SQLALCHEMY_ECHO=1 imprime cada consulta SQL en la consola
+    SQLALCHEMY_ECHO = os.getenv("SQLALCHEMY_ECHO") == "1"
+
+
+class ProductionConfig(Config):
+    pass
+
+
+class TestingConfig(Config):
+    """BD en memoria y sin admin; los fixtures de tests/ cambian la URI si hace falta"""
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite://"
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    ENABLE_ADMIN = False
+    IDEMPOTENCY_WAIT_TIMEOUT = 2.0
+    RATELIMIT_ENABLED = False
+    PROFILING_SECRET = ""
+
+
+def default_config():
+    """Configuración según FLASK_DEBUG, igual que antes de existir el factory"""
+    if os.getenv("FLASK_DEBUG") == "1":
+        return DevelopmentConfig
+    return ProductionConfig
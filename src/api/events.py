@@ -0,0 +1,117 @@
+"""
+Pub/sub en proceso para enviar eventos de pedidos por Server-Sent Events.
+Las rutas publican después de confirmar la transacción y cada conexión SSE
+tiene su propia cola acotada, de forma que un cliente lento nunca hace crecer
+la memoria: si su cola se llena se vacía y recibe un evento 'resync'.
+"""
+import itertools
+import json
+import queue
+import threading
+
+DEFAULT_QUEUE_SIZE = 100
+
+
+class LocalBackend:
+    """
+    Transporte entre procesos de sustitución: entrega los eventos solo dentro
+    del proceso actual. Un backend real (Redis pub/sub, LISTEN/NOTIFY de
+    Postgres) implementaría la misma interfaz para repartir entre workers.
+    """
+
+    def __init__(self):
+        self._listener = None
+
+    def start(self, listener):
+        self._listener = listener
+
+    def publish(self, event):
+        if self._listener is not None:
+            self._listener(event)
+
+
+class Subscription:
+    """Cola acotada de eventos de una conexión SSE"""
+
+    def __init__(self, maxsize):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._overflowed = False
+        self._lock = threading.Lock()
+
+    def push(self, event):
+        with self._lock:
+            if self._overflowed:
+                return
+            try:
+                self._queue.put_nowait(event)
+            except queue.Full:
+                # Descartar lo pendiente: el cliente tendrá que recargar
+                while not self._queue.empty():
+                    self._queue.get_nowait()
+                self._overflowed = True
+
+    def get(self, timeout):
+        """Returns: el siguiente evento, o None si no llegó ninguno a tiempo"""
+        with self._lock:
+            if self._overflowed:
+                self._overflowed = False
+                return {"id": None, "type": "resync", "data": {}}
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBroker:
+    """Reparte los eventos publicados entre las suscripciones activas"""
+
+    def __init__(self, backend=None, queue_size=DEFAULT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.backend = backend or LocalBackend()
+        self.backend.start(self._dispatch)
+
+    def subscribe(self, max_subscriptions=None):
+        """Returns: la suscripción, o None si ya hay `max_subscriptions` activas"""
+        subscription = Subscription(self.queue_size)
+        with self._lock:
+            if max_subscriptions is not None and len(self._subscriptions) >= max_subscriptions:
+                return None
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscriptions)
+
+    def publish(self, event_type, data):
+        self.backend.publish({
+            "id": next(self._ids),
+            "type": event_type,
+            "data": data
+        })
+
+    def _dispatch(self, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.push(event)
+
+
+def format_sse(event):
+    """Serializa un evento en el formato de text/event-stream"""
+    lines = []
+    if event["id"] is not None:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event['type']}")
+    lines.append(f"data: {json.dumps(event['data'])}")
+    return "\n".join(lines) + "\n\n"
+
+
+broker = EventBroker()
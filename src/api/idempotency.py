@@ -0,0 +1,247 @@
+"""
+Soporte para la cabecera Idempotency-Key en los endpoints de creación.
+Un reintento con la misma clave devuelve la respuesta almacenada sin volver
+a ejecutar la operación, y las peticiones concurrentes con la misma clave
+esperan a que termine la primera en lugar de competir con ella.
+La reserva de la clave ('in_progress') dura IDEMPOTENCY_LOCK_TIMEOUT
+segundos: si el worker muere a mitad, un reintento posterior la recupera y
+ejecuta la operación. Para no repetir trabajo ya confirmado, el primer
+commit de la vista marca la clave como 'committed' en la misma transacción;
+una clave 'committed' sin respuesta guardada no se vuelve a ejecutar.
+"""
+import hashlib
+import time
+from datetime import timedelta
+from functools import wraps
+
+from flask import current_app, g, has_request_context, jsonify, make_response, request
+from sqlalchemy import delete, event, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from api.models import db, IdempotencyKey
+from api.utils import utcnow
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+# Valores por defecto, sobrescribibles desde app.config
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_CLEANUP_INTERVAL = 5 * 60
+DEFAULT_WAIT_TIMEOUT = 10.0
+DEFAULT_LOCK_TIMEOUT = 60
+
+_last_cleanup = 0.0
+
+
+def _hash_request():
+    """Huella de la petición: método, ruta y cuerpo exacto"""
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(b"\0")
+    digest.update(request.path.encode())
+    digest.update(b"\0")
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def purge_expired_keys():
+    """Elimina las claves caducadas. Returns: número de filas borradas"""
+    result = db.session.execute(
+        delete(IdempotencyKey).where(IdempotencyKey.expires_at < utcnow()))
+    db.session.commit()
+    return result.rowcount
+
+
+def _maybe_purge_expired_keys():
+    """Limpieza periódica: como mucho una vez por intervalo y proceso"""
+    global _last_cleanup
+    interval = current_app.config.get(
+        "IDEMPOTENCY_CLEANUP_INTERVAL", DEFAULT_CLEANUP_INTERVAL)
+    now = time.monotonic()
+    if now - _last_cleanup < interval:
+        return
+    _last_cleanup = now
+    try:
+        purge_expired_keys()
+    except Exception:
+        db.session.rollback()
+
+
+def _lock_expiry():
+    lock_timeout = current_app.config.get("IDEMPOTENCY_LOCK_TIMEOUT", DEFAULT_LOCK_TIMEOUT)
+    return utcnow() + timedelta(seconds=lock_timeout)
+
+
+def _claim(key, request_hash):
+    """
+    Intenta reservar la clave para esta petición.
+    Returns: None si la reserva es nuestra, o el registro existente
+    """
+    ttl = current_app.config.get("IDEMPOTENCY_KEY_TTL", DEFAULT_TTL)
+    try:
+        db.session.add(IdempotencyKey(
+            key=key,
+            request_hash=request_hash,
+            status="in_progress",
+            locked_until=_lock_expiry(),
+            expires_at=utcnow() + timedelta(seconds=ttl)
+        ))
+        db.session.commit()
+        return None
+    except IntegrityError:
+        db.session.rollback()
+
+    record = db.session.get(IdempotencyKey, key, populate_existing=True)
+    if record is None:
+        # La reserva anterior se liberó entre el INSERT y la lectura
+        return _claim(key, request_hash)
+    if record.expires_at < utcnow():
+        db.session.delete(record)
+        db.session.commit()
+        return _claim(key, request_hash)
+    return record
+
+
+def _take_over(key):
+    """
+    Recupera una reserva caducada (el worker que la tenía murió antes de
+    confirmar nada). Returns: True si la reserva pasa a ser nuestra
+    """
+    now = utcnow()
+    result = db.session.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.key == key,
+               IdempotencyKey.status == "in_progress",
+               IdempotencyKey.locked_until < now)
+        .values(locked_until=_lock_expiry())
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+@event.listens_for(Session, "before_commit")
+def _mark_committed(session):
+    """Marca la clave como 'committed' en la transacción que confirma la operación"""
+    key = g.get("idempotency_key") if has_request_context() else None
+    if key:
+        session.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.key == key, IdempotencyKey.status == "in_progress")
+            .values(status="committed")
+        )
+
+
+def _release(key):
+    """
+    Libera la reserva para que un reintento pueda volver a ejecutarse, salvo
+    que la operación ya se confirmara: entonces la clave se conserva y los
+    reintentos lo saben sin esperar
+    """
+    db.session.rollback()
+    db.session.execute(delete(IdempotencyKey).where(
+        IdempotencyKey.key == key, IdempotencyKey.status == "in_progress"))
+    db.session.execute(update(IdempotencyKey).where(
+        IdempotencyKey.key == key).values(locked_until=utcnow()))
+    db.session.commit()
+
+
+def _store(key, response):
+    """Guarda la respuesta final asociada a la clave"""
+    if response.status_code >= 500:
+        _release(key)
+        return
+
+    body = response.get_data(as_text=True)
+    record = db.session.get(IdempotencyKey, key, populate_existing=True)
+    if record is None:
+        return
+    record.status = "completed"
+    record.locked_until = None
+    record.response_status = response.status_code
+    record.response_body = body
+    record.response_hash = hashlib.sha256(body.encode()).hexdigest()
+    record.response_etag = response.headers.get("ETag")
+    db.session.commit()
+
+
+def _replay(record):
+    """Reconstruye la respuesta almacenada"""
+    response = current_app.response_class(
+        record.response_body,
+        status=record.response_status,
+        mimetype="application/json"
+    )
+    if record.response_etag:
+        response.headers["ETag"] = record.response_etag
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(view):
+    """
+    Decorador para endpoints POST que aceptan la cabecera Idempotency-Key.
+    Sin cabecera el endpoint se comporta exactamente igual que antes.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER, "").strip()
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({
+                "error": f"{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters"
+            }), 400
+
+        _maybe_purge_expired_keys()
+        request_hash = _hash_request()
+        wait_timeout = current_app.config.get(
+            "IDEMPOTENCY_WAIT_TIMEOUT", DEFAULT_WAIT_TIMEOUT)
+        deadline = time.monotonic() + wait_timeout
+        poll_interval = 0.05
+
+        # Esperar mientras otra petición con la misma clave está en curso
+        record = _claim(key, request_hash)
+        while record is not None:
+            if record.request_hash != request_hash:
+                return jsonify({
+                    "error": f"{IDEMPOTENCY_HEADER} was already used with a different request"
+                }), 422
+            if record.status == "completed":
+                return _replay(record)
+            if record.locked_until < utcnow():
+                if record.status == "committed":
+                    return jsonify({
+                        "error": f"The request with this {IDEMPOTENCY_HEADER} was processed "
+                                 "but its response could not be stored"
+                    }), 409
+                if _take_over(key):
+                    break
+            if time.monotonic() >= deadline:
+                response = jsonify({
+                    "error": f"A request with this {IDEMPOTENCY_HEADER} is still being processed"
+                })
+                response.headers["Retry-After"] = "1"
+                return response, 409
+            time.sleep(poll_interval)
+            poll_interval = min(poll_interval * 2, 0.5)
+            db.session.rollback()
+            record = db.session.get(
+                IdempotencyKey, key, populate_existing=True)
+            if record is None:
+                # La petición original falló y liberó la clave
+                record = _claim(key, request_hash)
+
+        g.idempotency_key = key
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            g.idempotency_key = None
+            _release(key)
+            raise
+        g.idempotency_key = None
+
+        _store(key, response)
+        return response
+
+    return wrapper
@@ -0,0 +1,34 @@
+"""
+Contadores en memoria del proceso, expuestos en GET /api/metrics.
+Cada contador se identifica por nombre y etiquetas (p. ej. ruta y decisión).
+"""
+import threading
+
+
+class Metrics:
+
+    def __init__(self):
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def snapshot(self):
+        """Returns: {nombre: [{"labels": {...}, "value": n}, ...]}"""
+        with self._lock:
+            items = list(self._counters.items())
+        result = {}
+        for (name, labels), value in sorted(items):
+            result.setdefault(name, []).append(
+                {"labels": dict(labels), "value": value})
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+
+
+metrics = Metrics()
@@ -1,42 +1,171 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import String, Integer, Float, DateTime, ForeignKey, func
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import (
+    DDL, BigInteger, String, Integer, Float, Text, DateTime, ForeignKey,
+    bindparam, event, func, case, insert, select, text, update
+)
+from sqlalchemy.orm import Mapped, Session, mapped_column, relationship, with_loader_criteria
 
 db = SQLAlchemy()
 
+ORDER_STATUSES = ("pending", "completed", "cancelled")
 
-class User(db.Model):
+# Predicados de los índices parciales: deben coincidir con los que añade
+# exclude_soft_deleted para que el planner (Postgres y SQLite) los use
+NOT_DELETED = "deleted_at IS NULL"
+DELETED = "deleted_at IS NOT NULL"
+
+
+# Control de concurrencia optimista: las actualizaciones ORM de User y Order
+# comprueban y suben la columna version (version_id_col) y fallan con
+# StaleDataError si otra petición la cambió antes. Los UPDATE de core que
+# cambian datos editables deben subirla a mano con bump_version(); el
+# resumen de pedidos de User lo mantiene el servidor y no la sube, para que
+# crear pedidos no invalide la edición de nombre o email.
+
+
+def bump_version(model):
+    """Valores para un UPDATE de core que cuenta como nueva versión"""
+    return {"version": model.version + 1}
+
+
+def partial_index(name, *columns, where):
+    """Índice parcial en Postgres y SQLite (ambos admiten WHERE en el índice)"""
+    return db.Index(name, *columns, postgresql_where=text(where), sqlite_where=text(where))
+
+
+def trigram_index(name, column):
+    """
+    Índice GIN de trigramas (pg_trgm) para las búsquedas ILIKE '%texto%' de
+    la API y del admin, que un b-tree no puede usar. Solo existe en Postgres.
+    """
+    return db.Index(
+        name, column, postgresql_using="gin", postgresql_ops={column: "gin_trgm_ops"}
+    ).ddl_if(dialect="postgresql")
+
+
+event.listen(db.metadata, "before_create",
+             DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"))
+
+
+class SoftDeleteMixin:
+    """
+    Borrado lógico: las filas con deleted_at no se devuelven en las consultas
+    ORM salvo con .execution_options(include_deleted=True).
+    """
+    deleted_at: Mapped[DateTime] = mapped_column(DateTime, nullable=True)
+
+    @property
+    def is_deleted(self):
+        return self.deleted_at is not None
+
+
+@event.listens_for(Session, "do_orm_execute")
+def exclude_soft_deleted(execute_state):
+    """Añade deleted_at IS NULL a todos los SELECT ORM de modelos con borrado lógico"""
+    include_deleted = execute_state.execution_options.get("include_deleted", False)
+    if execute_state.is_select and not execute_state.is_column_load and not include_deleted:
+        execute_state.statement = execute_state.statement.options(
+            with_loader_criteria(
+                SoftDeleteMixin,
+                lambda cls: cls.deleted_at.is_(None),
+                include_aliases=True
+            )
+        )
+
+
+class User(SoftDeleteMixin, db.Model):
     id: Mapped[int] = mapped_column(primary_key=True)
-    name: Mapped[str] = mapped_column(String(120), nullable=False)
+    name: Mapped[str] = mapped_column(String(120), nullable=False, index=True)
     email: Mapped[str] = mapped_column(
         String(120), unique=True, nullable=False)
+    # Indexada solo para las filas activas (ix_user_active_created_at)
     created_at: Mapped[DateTime] = mapped_column(
         DateTime, default=func.now(), nullable=False)
 
+    # Resumen de pedidos mantenido por las rutas (ver apply_order_summary_delta)
+    order_count: Mapped[int] = mapped_column(
+        Integer, default=0, server_default="0", nullable=False)
+    order_total: Mapped[float] = mapped_column(
+        Float, default=0, server_default="0", nullable=False)
+    pending_order_count: Mapped[int] = mapped_column(
+        Integer, default=0, server_default="0", nullable=False)
+    completed_order_count: Mapped[int] = mapped_column(
+        Integer, default=0, server_default="0", nullable=False)
+    cancelled_order_count: Mapped[int] = mapped_column(
+        Integer, default=0, server_default="0", nullable=False)
+    # Cuántos de esos pedidos están en archived_order (flask archive-orders)
+    archived_order_count: Mapped[int] = mapped_column(
+        Integer, default=0, server_default="0", nullable=False)
+    last_order_at: Mapped[DateTime] = mapped_column(DateTime, nullable=True)
+
+    # Versión para el control de concurrencia optimista (ver bump_version)
+    version: Mapped[int] = mapped_column(
+        Integer, default=1, server_default="1", nullable=False)
+
     orders = relationship("Order", back_populates="user")
 
+    __mapper_args__ = {"version_id_col": version}
+    __table_args__ = (
+        partial_index("ix_user_active_created_at", "created_at", where=NOT_DELETED),
+        partial_index("ix_user_deleted_at", "deleted_at", where=DELETED),
+        trigram_index("ix_user_name_trgm", "name"),
+        trigram_index("ix_user_email_trgm", "email"),
+    )
+
+    def order_summary(self):
+        return {
+            "order_count": self.order_count,
+            "total_amount": self.order_total,
+            "by_status": {
+                status: getattr(self, f"{status}_order_count")
+                for status in ORDER_STATUSES
+            },
+            "last_order_at": self.last_order_at.isoformat() if self.last_order_at else None
+        }
+
     def serialize(self):
         return {
             "id": self.id,
             "name": self.name,
             "email": self.email,
             "created_at": self.created_at.isoformat(),
-            "order_count": len(self.orders)
+            "version": self.version,
+            "order_count": self.order_count,
+            "order_summary": self.order_summary()
         }
 
 
-class Order(db.Model):
+class Order(SoftDeleteMixin, db.Model):
     id: Mapped[int] = mapped_column(primary_key=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("user.id"), nullable=False)
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("user.id"), nullable=False, index=True)
     product_name: Mapped[str] = mapped_column(String(120), nullable=False)
     amount: Mapped[float] = mapped_column(Integer, nullable=False)
     status: Mapped[str] = mapped_column(
         String(20), default="pending", nullable=False)
+    # Indexada solo para las filas activas (ix_order_active_created_at)
     created_at: Mapped[DateTime] = mapped_column(
         DateTime, default=func.now(), nullable=False)
+    version: Mapped[int] = mapped_column(
+        Integer, default=1, server_default="1", nullable=False)
+    # Reserva de un pedido pendiente por un worker (ver order_queue.py)
+    claimed_by: Mapped[str] = mapped_column(String(100), nullable=True)
+    claim_expires_at: Mapped[DateTime] = mapped_column(DateTime, nullable=True)
 
     user = relationship("User", back_populates="orders")
 
+    __mapper_args__ = {"version_id_col": version}
+    __table_args__ = (
+        partial_index("ix_order_active_created_at", "created_at", where=NOT_DELETED),
+        partial_index("ix_order_active_user_id_created_at", "user_id", "created_at",
+                      where=NOT_DELETED),
+        # Cola por estado: filtro status y siguientes pendientes por antigüedad
+        partial_index("ix_order_active_status_created_at", "status", "created_at",
+                      where=NOT_DELETED),
+        partial_index("ix_order_deleted_at", "deleted_at", where=DELETED),
+        trigram_index("ix_order_product_name_trgm", "product_name"),
+    )
+
     def serialize(self):
         return {
             "id": self.id,
@@ -45,5 +174,197 @@ class Order(db.Model):
             "amount": self.amount,
             "status": self.status,
             "created_at": self.created_at.isoformat(),
+            "version": self.version,
             "user_name": self.user.name if self.user else None
         }
+
+
+class ArchivedOrder(db.Model):
+    """
+    Pedidos completados o cancelados antiguos, movidos fuera de la tabla
+    'order' por `flask archive-orders` para que las consultas habituales
+    solo recorran datos recientes. Conserva el id original del pedido.
+    """
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    user_id: Mapped[int] = mapped_column(ForeignKey("user.id"), nullable=False)
+    product_name: Mapped[str] = mapped_column(String(120), nullable=False)
+    amount: Mapped[float] = mapped_column(Float, nullable=False)
+    status: Mapped[str] = mapped_column(String(20), nullable=False)
+    created_at: Mapped[DateTime] = mapped_column(DateTime, nullable=False)
+    archived_at: Mapped[DateTime] = mapped_column(
+        DateTime, default=func.now(), nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_archived_order_user_id_created_at", "user_id", "created_at"),
+        db.Index("ix_archived_order_created_at", "created_at"),
+    )
+
+
+def apply_order_summary_delta(user_id, count=0, amount=0, status_deltas=None, touch_last_order=False):
+    """
+    Actualiza el resumen de pedidos de un usuario con un UPDATE atómico
+    (columna = columna + delta), dentro de la transacción de la ruta que llama.
+    """
+    apply_order_summary_deltas(
+        {user_id: (count, amount, status_deltas)}, touch_last_order=touch_last_order)
+
+
+def apply_order_summary_deltas(deltas, touch_last_order=False):
+    """
+    Igual que apply_order_summary_delta para varios usuarios a la vez:
+    `deltas` es {user_id: (count, amount, status_deltas)}. Es un único UPDATE
+    ejecutado con executemany (una fila de parámetros por usuario) y una sola
+    inserción en el change log, sin sentencias por usuario.
+    """
+    if not deltas:
+        return
+    table = User.__table__
+    values = {
+        "order_count": table.c.order_count + bindparam("delta_count", type_=Integer),
+        "order_total": table.c.order_total + bindparam("delta_amount", type_=Float),
+    }
+    for status in ORDER_STATUSES:
+        column = table.c[f"{status}_order_count"]
+        values[column.key] = column + bindparam(f"delta_{status}", type_=Integer)
+    if touch_last_order:
+        values["last_order_at"] = func.now()
+
+    rows = []
+    for user_id, (count, amount, status_deltas) in deltas.items():
+        row = {"delta_user_id": user_id, "delta_count": count, "delta_amount": amount}
+        for status in ORDER_STATUSES:
+            row[f"delta_{status}"] = (status_deltas or {}).get(status, 0)
+        rows.append(row)
+
+    db.session.execute(
+        update(table).where(table.c.id == bindparam("delta_user_id")).values(**values), rows)
+    record_changes("user", deltas, "updated")
+
+
+def refresh_order_summaries(user_ids=None):
+    """
+    Recalcula el resumen desde las tablas de pedidos (activos y archivados)
+    con un único UPDATE basado en subconsultas correlacionadas.
+    Los pedidos borrados no cuentan. Sin user_ids recalcula todos.
+    """
+    def aggregate(model, expression, *criteria):
+        if model is Order:
+            criteria += (Order.deleted_at.is_(None),)
+        return (
+            select(expression)
+            .where(model.user_id == User.id, *criteria)
+            .scalar_subquery()
+        )
+
+    def combined(expression, *criteria):
+        active = aggregate(Order, expression(Order), *criteria)
+        archived = aggregate(ArchivedOrder, expression(ArchivedOrder), *criteria)
+        return active + archived
+
+    def count(model):
+        return func.count(model.id)
+
+    archived_count = aggregate(ArchivedOrder, func.count(ArchivedOrder.id))
+    last_active = aggregate(Order, func.max(Order.created_at))
+    last_archived = aggregate(ArchivedOrder, func.max(ArchivedOrder.created_at))
+
+    values = {
+        "order_count": combined(count),
+        "order_total": combined(lambda model: func.coalesce(func.sum(model.amount), 0)),
+        "archived_order_count": archived_count,
+        "last_order_at": case(
+            (last_archived.is_(None), last_active),
+            (last_active.is_(None), last_archived),
+            (last_active > last_archived, last_active),
+            else_=last_archived
+        ),
+    }
+    for status in ORDER_STATUSES:
+        active = aggregate(Order, count(Order), Order.status == status)
+        archived = aggregate(ArchivedOrder, count(ArchivedOrder), ArchivedOrder.status == status)
+        values[f"{status}_order_count"] = active + archived
+
+    statement = update(User).values(**values)
+    if user_ids is not None:
+        statement = statement.where(User.id.in_(list(user_ids)))
+    db.session.execute(statement)
+
+
+class IdempotencyKey(db.Model):
+    """
+    Respuesta almacenada para una cabecera Idempotency-Key.
+    Mientras la petición original se procesa el estado es 'in_progress'
+    (reservada hasta locked_until) y 'committed' en cuanto confirma su
+    operación; al terminar se guarda la respuesta para los reintentos.
+    """
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    request_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    status: Mapped[str] = mapped_column(
+        String(20), default="in_progress", nullable=False)
+    response_status: Mapped[int] = mapped_column(Integer, nullable=True)
+    response_body: Mapped[str] = mapped_column(Text, nullable=True)
+    response_hash: Mapped[str] = mapped_column(String(64), nullable=True)
+    response_etag: Mapped[str] = mapped_column(String(64), nullable=True)
+    locked_until: Mapped[DateTime] = mapped_column(DateTime, nullable=True)
+    created_at: Mapped[DateTime] = mapped_column(
+        DateTime, default=func.now(), nullable=False)
+    expires_at: Mapped[DateTime] = mapped_column(
+        DateTime, nullable=False, index=True)
+
+
+class ChangeLog(db.Model):
+    """
+    Registro de altas, cambios y bajas de usuarios y pedidos.
+    GET /api/changes lo recorre en orden (txid, id): el id se asigna al
+    insertar, no al confirmar, así que una transacción larga puede confirmar
+    ids más bajos que otra ya leída. txid agrupa las filas por transacción
+    (ver api/change_feed.py).
+    """
+    id: Mapped[int] = mapped_column(primary_key=True)
+    # txid_current() en Postgres; 0 en SQLite, que serializa las escrituras
+    # y confirma los ids en orden
+    txid: Mapped[int] = mapped_column(
+        BigInteger, default=0, server_default="0", nullable=False)
+    entity_type: Mapped[str] = mapped_column(String(20), nullable=False)
+    entity_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    action: Mapped[str] = mapped_column(String(20), nullable=False)
+    changed_at: Mapped[DateTime] = mapped_column(
+        DateTime, default=func.now(), nullable=False, index=True)
+
+    __table_args__ = (
+        db.Index("ix_change_log_txid_id", "txid", "id"),
+    )
+
+
+def current_txid():
+    """
+    Id de la transacción actual en Postgres (0 en el resto). Se consulta una
+    sola vez por transacción; las siguientes llamadas lo leen de session.info.
+    """
+    if db.session.get_bind().dialect.name != "postgresql":
+        return 0
+    transaction = db.session.get_transaction()
+    cached = db.session.info.get("txid")
+    if transaction is not None and cached and cached[0] is transaction:
+        return cached[1]
+    txid = db.session.execute(select(func.txid_current())).scalar()
+    db.session.info["txid"] = (db.session.get_transaction(), txid)
+    return txid
+
+
+def record_change(entity_type, entity_id, action):
+    """Añade una entrada al change log en la transacción actual"""
+    record_changes(entity_type, [entity_id], action)
+
+
+def record_changes(entity_type, entity_ids, action):
+    """Añade varias entradas al change log con un único INSERT"""
+    entity_ids = list(entity_ids)
+    if not entity_ids:
+        return
+    txid = current_txid()
+    rows = [
+        {"txid": txid, "entity_type": entity_type, "entity_id": entity_id, "action": action}
+        for entity_id in entity_ids
+    ]
+    db.session.execute(insert(ChangeLog), rows)
@@ -0,0 +1,55 @@
+"""
+Cola de pedidos pendientes para los workers de preparación.
+POST /api/orders/claim reserva los N pendientes más antiguos para un worker
+durante un tiempo (lease). Cada pedido reservado lo procesa un único worker,
+que termina con PATCH /api/orders/<id> usando If-Match con la versión que
+recibió: si la reserva caducó y otro worker lo volvió a reservar, la versión
+ya no coincide y recibe 412 en lugar de procesarlo dos veces.
+La búsqueda recorre el índice parcial (status, created_at) de pedidos activos.
+"""
+from datetime import timedelta
+
+from sqlalchemy import or_, select, update
+
+from api.models import db, Order, bump_version, record_changes
+from api.utils import utcnow
+
+MAX_CLAIM = 100
+
+
+def claimable(now):
+    """Filtros de los pedidos pendientes sin reserva o con la reserva caducada"""
+    return [
+        Order.status == "pending",
+        Order.deleted_at.is_(None),
+        or_(Order.claim_expires_at.is_(None), Order.claim_expires_at < now),
+    ]
+
+
+def claim_orders(worker, limit, lease_seconds):
+    """
+    Reserva hasta `limit` pedidos pendientes para `worker` con una única
+    sentencia: UPDATE ... WHERE id IN (SELECT ... FOR UPDATE SKIP LOCKED)
+    RETURNING id. En Postgres los workers concurrentes se saltan las filas
+    que otro está reservando en lugar de esperar; SQLite no tiene bloqueos
+    de fila (se omite FOR UPDATE), pero serializa las escrituras, así que el
+    UPDATE con la subconsulta es igualmente atómico.
+    Returns: (ids reservados, fecha de caducidad de la reserva)
+    """
+    now = utcnow()
+    expires_at = now + timedelta(seconds=lease_seconds)
+    candidates = (
+        select(Order.id)
+        .where(*claimable(now))
+        .order_by(Order.created_at, Order.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    order_ids = db.session.execute(
+        update(Order)
+        .where(Order.id.in_(candidates))
+        .values(claimed_by=worker, claim_expires_at=expires_at, **bump_version(Order))
+        .returning(Order.id)
+    ).scalars().all()
+    record_changes("order", order_ids, "updated")
+    return order_ids, expires_at
@@ -0,0 +1,380 @@
+"""
+Profiling bajo demanda de peticiones de la API.
+Con PROFILING_SECRET configurado, create_app() envuelve la app WSGI con
+ProfilingMiddleware, que perfila:
+- las peticiones con la cabecera X-Profile-Token igual al secreto
+- una fracción PROFILING_SAMPLE_RATE del resto de peticiones a /api
+El perfil es de muestreo: un hilo toma la pila del hilo de la petición cada
+PROFILING_INTERVAL segundos, así que el coste es bajo y las pilas se exportan
+tal cual a formato "collapsed" (flamegraph.pl, speedscope, inferno). El SQL
+se cronometra por sentencia con los eventos del engine, y las muestras
+tomadas durante una consulta terminan en un marco "SQL: <sentencia>".
+Los perfiles se guardan como JSON en PROFILING_DIR, conservando solo los
+PROFILING_MAX_PROFILES más recientes. Las respuestas text/event-stream (SSE)
+no se perfilan: durarían lo que la conexión y bloquearían el profiling del
+proceso mientras tanto.
+"""
+import hmac
+import json
+import os
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from werkzeug.exceptions import HTTPException
+
+from api.metrics import metrics
+
+TOKEN_HEADER = "HTTP_X_PROFILE_TOKEN"
+PROFILE_ID = re.compile(r"^[0-9]{13}-[0-9a-f]{8}$")
+SQL_LABEL_LENGTH = 120
+
+_local = threading.local()
+_listeners_installed = False
+
+
+# ============== SQL ==============
+
+class SqlRecorder:
+    """Tiempo de cada sentencia SQL ejecutada durante la petición perfilada"""
+
+    def __init__(self):
+        self.statements = {}
+        self.current = None
+        self._started = None
+
+    def start(self, statement):
+        self.current = sql_label(statement)
+        self._started = time.perf_counter()
+
+    def finish(self):
+        if self.current is None:
+            return
+        elapsed = time.perf_counter() - self._started
+        count, total, slowest = self.statements.get(self.current, (0, 0.0, 0.0))
+        self.statements[self.current] = (count + 1, total + elapsed, max(slowest, elapsed))
+        self.current = None
+
+    def summary(self):
+        """Returns: sentencias ordenadas por tiempo total, en ms"""
+        return [
+            {
+                "statement": statement,
+                "count": count,
+                "total_ms": round(total * 1000, 3),
+                "max_ms": round(slowest * 1000, 3)
+            }
+            for statement, (count, total, slowest) in sorted(
+                self.statements.items(), key=lambda item: item[1][1], reverse=True)
+        ]
+
+
+def sql_label(statement):
+    """Sentencia en una línea y recortada, válida como marco de una pila collapsed"""
+    label = " ".join(statement.split()).replace(";", ",")
+    if len(label) > SQL_LABEL_LENGTH:
+        label = label[:SQL_LABEL_LENGTH - 3] + "..."
+    return label
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    recorder = getattr(_local, "recorder", None)
+    if recorder is not None:
+        recorder.start(statement)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    recorder = getattr(_local, "recorder", None)
+    if recorder is not None:
+        recorder.finish()
+
+
+def install_sql_listeners():
+    """Escucha todos los engines; fuera de una petición perfilada no hace nada"""
+    global _listeners_installed
+    if not _listeners_installed:
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        _listeners_installed = True
+
+
+# ============== MUESTREO ==============
+
+class StackSampler(threading.Thread):
+    """Toma periódicamente la pila de un hilo y cuenta las pilas repetidas"""
+
+    def __init__(self, thread_id, interval, max_seconds, recorder):
+        super().__init__(name="profiling-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.recorder = recorder
+        self.stacks = Counter()
+        self.samples = 0
+        self._stopped = threading.Event()
+
+    def run(self):
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stopped.wait(self.interval) and time.monotonic() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame))
+                frame = frame.f_back
+            stack.reverse()
+            statement = self.recorder.current
+            if statement is not None:
+                stack.append(f"SQL: {statement}")
+            self.stacks[";".join(stack)] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def frame_label(frame):
+    """nombre (fichero:línea de la función), sin ';' para el formato collapsed"""
+    code = frame.f_code
+    return f"{code.co_name} ({short_path(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+
+
+def short_path(filename):
+    for marker in ("site-packages" + os.sep, "src" + os.sep):
+        index = filename.rfind(marker)
+        if index != -1:
+            return filename[index + len(marker):]
+    return os.path.basename(filename)
+
+
+# ============== ALMACENAMIENTO ==============
+
+class ProfileStore:
+    """Directorio con los últimos `max_profiles` perfiles en JSON"""
+
+    def __init__(self, directory, max_profiles=100):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+
+    def _path(self, profile_id):
+        return os.path.join(self.directory, f"{profile_id}.json")
+
+    def save(self, profile):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(profile["id"])
+        with open(path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(profile, file)
+        os.replace(path + ".tmp", path)
+        self._prune()
+
+    def _prune(self):
+        with self._lock:
+            profile_ids = self._ids()
+            for profile_id in profile_ids[self.max_profiles:]:
+                try:
+                    os.remove(self._path(profile_id))
+                except FileNotFoundError:
+                    pass
+
+    def _ids(self):
+        """Ids de más reciente a más antiguo (el id empieza por el timestamp)"""
+        try:
+            filenames = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        profile_ids = [name[:-5] for name in filenames
+                       if name.endswith(".json") and PROFILE_ID.match(name[:-5])]
+        return sorted(profile_ids, reverse=True)
+
+    def get(self, profile_id):
+        if not PROFILE_ID.match(profile_id):
+            return None
+        try:
+            with open(self._path(profile_id), encoding="utf-8") as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def list(self):
+        """Resumen de cada perfil guardado, sin las pilas"""
+        profiles = []
+        for profile_id in self._ids():
+            profile = self.get(profile_id)
+            if profile is not None:
+                profile.pop("stacks", None)
+                profile["sql"] = profile["sql"][:5]
+                profiles.append(profile)
+        return profiles
+
+
+def collapsed_stacks(profile):
+    """Perfil en formato collapsed: 'marco;marco;marco muestras' por línea"""
+    lines = [f"{stack} {count}" for stack, count in sorted(profile["stacks"].items())]
+    return "\n".join(lines) + "\n"
+
+
+def store_from_config(config):
+    return ProfileStore(config["PROFILING_DIR"], config["PROFILING_MAX_PROFILES"])
+
+
+def valid_token(config, token):
+    """Compara el token con PROFILING_SECRET en tiempo constante"""
+    secret = config.get("PROFILING_SECRET", "")
+    return bool(secret) and bool(token) and hmac.compare_digest(
+        token.encode(), secret.encode())
+
+
+# ============== MIDDLEWARE ==============
+
+class ProfilingMiddleware:
+
+    def __init__(self, wsgi_app, config, url_map):
+        self.wsgi_app = wsgi_app
+        self.config = config
+        self.url_map = url_map
+        self.store = store_from_config(config)
+        # Un único perfil a la vez por proceso: acota el coste y evita que
+        # los muestreos de peticiones concurrentes se mezclen
+        self._busy = threading.Lock()
+        install_sql_listeners()
+
+    def should_profile(self, environ):
+        path = environ.get("PATH_INFO", "")
+        if not path.startswith("/api/") or path.startswith("/api/profiles"):
+            return False
+        if environ.get(TOKEN_HEADER):
+            return valid_token(self.config, environ[TOKEN_HEADER])
+        sample_rate = self.config.get("PROFILING_SAMPLE_RATE", 0)
+        return sample_rate > 0 and random.random() < sample_rate
+
+    def __call__(self, environ, start_response):
+        if not self.should_profile(environ) or not self._busy.acquire(blocking=False):
+            return self.wsgi_app(environ, start_response)
+        try:
+            return self._profile(environ, start_response)
+        except BaseException:
+            self._busy.release()
+            raise
+
+    def _profile(self, environ, start_response):
+        profile_id = f"{int(time.time() * 1000)}-{secrets.token_hex(4)}"
+        recorder = SqlRecorder()
+        sampler = StackSampler(
+            threading.get_ident(),
+            self.config.get("PROFILING_INTERVAL", 0.005),
+            self.config.get("PROFILING_MAX_SECONDS", 30),
+            recorder
+        )
+        response_status = []
+        discarded = []
+
+        def profiled_start_response(status, headers, exc_info=None):
+            if any(name.lower() == "content-type" and value.startswith("text/event-stream")
+                   for name, value in headers):
+                # Stream SSE: se descarta el perfil y se libera el lock ya
+                if not discarded:
+                    discarded.append(True)
+                    self._discard(sampler)
+                return start_response(status, headers, exc_info)
+            response_status.append(status)
+            headers = list(headers) + [("X-Profile-Id", profile_id)]
+            return start_response(status, headers, exc_info)
+
+        started_at = time.time()
+        started = time.perf_counter()
+        _local.recorder = recorder
+        sampler.start()
+        try:
+            body = self.wsgi_app(environ, profiled_start_response)
+        except BaseException:
+            if not discarded:
+                self._finish(sampler, recorder, profile_id, environ, "500", started_at, started)
+            raise
+        if discarded:
+            return body
+        # El cuerpo (también en streaming) se genera al iterarlo, así que el
+        # perfil se cierra cuando el servidor termina de enviarlo
+        return ProfiledBody(body, lambda: self._finish(
+            sampler, recorder, profile_id, environ,
+            response_status[0] if response_status else None, started_at, started))
+
+    def route(self, environ):
+        """Plantilla de la ruta (/api/orders/<int:order_id>), sin los ids de la URL"""
+        try:
+            rule, _ = self.url_map.bind_to_environ(environ).match(return_rule=True)
+            return rule.rule
+        except HTTPException:
+            return "unmatched"
+
+    def _discard(self, sampler):
+        try:
+            sampler.stop()
+            _local.recorder = None
+        finally:
+            self._busy.release()
+
+    def _finish(self, sampler, recorder, profile_id, environ, status, started_at, started):
+        try:
+            duration = time.perf_counter() - started
+            sampler.stop()
+            _local.recorder = None
+            sql = recorder.summary()
+            route = self.route(environ)
+            self.store.save({
+                "id": profile_id,
+                "method": environ.get("REQUEST_METHOD"),
+                "path": environ.get("PATH_INFO"),
+                "route": route,
+                "query_string": environ.get("QUERY_STRING", ""),
+                "status": int(status.split()[0]) if status else None,
+                "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(started_at)),
+                "duration_ms": round(duration * 1000, 3),
+                "interval_ms": sampler.interval * 1000,
+                "samples": sampler.samples,
+                "sql_count": sum(statement["count"] for statement in sql),
+                "sql_total_ms": round(sum(statement["total_ms"] for statement in sql), 3),
+                "sql": sql,
+                "stacks": dict(sampler.stacks)
+            })
+            metrics.incr("profiles_recorded", route=route)
+        finally:
+            self._busy.release()
+
+
+class ProfiledBody:
+    """
+    Itera el cuerpo de la respuesta y llama a `on_close` una sola vez, al
+    cerrarlo o al terminar de iterarlo (por si el servidor no llama a close)
+    """
+
+    def __init__(self, body, on_close):
+        self.body = body
+        self.on_close = on_close
+        self._closed = False
+
+    def __iter__(self):
+        try:
+            yield from self.body
+        finally:
+            self._close_once()
+
+    def close(self):
+        try:
+            if hasattr(self.body, "close"):
+                self.body.close()
+        finally:
+            self._close_once()
+
+    def _close_once(self):
+        if not self._closed:
+            self._closed = True
+            self.on_close()
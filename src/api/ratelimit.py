@@ -0,0 +1,173 @@
+"""
+Limitación de peticiones para los endpoints costosos (exports, lotes, búsqueda).
+Dos controles por ruta:
+- token bucket por cliente: `rate` peticiones por segundo con ráfagas de `burst`
+- límite de concurrencia: como mucho `max_concurrent` peticiones en curso a la vez
+Las peticiones rechazadas reciben 429 con Retry-After y cada decisión se
+cuenta en las métricas (ratelimit_decisions).
+El cliente se identifica por su IP (remote_addr). Detrás de proxies,
+TRUSTED_PROXY_HOPS hace que create_app() aplique ProxyFix para que
+remote_addr sea la IP real; sin él, X-Forwarded-For se ignora, porque el
+cliente puede falsearla para estrenar un bucket en cada petición.
+El estado vive en el backend de RATELIMIT_BACKEND (por defecto, la memoria
+de cada proceso).
+"""
+import importlib
+import math
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, jsonify, request
+
+from api.metrics import metrics
+
+# (peticiones por segundo, ráfaga, peticiones concurrentes) por grupo de rutas
+DEFAULT_RATE_LIMITS = {
+    "export": (0.2, 3, 2),
+    "batch": (1.0, 5, 4),
+    "search": (10.0, 20, 8),
+}
+MAX_TRACKED_BUCKETS = 10000
+
+
+class LocalRateLimitBackend:
+    """
+    Estado de los límites en la memoria del proceso. Con varios workers cada
+    uno aplica el límite por separado; un backend compartido (Redis, por
+    ejemplo) implementaría la misma interfaz (take_token, acquire_slot y
+    release_slot, y un constructor que recibe la configuración de la app)
+    para aplicarlo de forma global, y se activa con RATELIMIT_BACKEND.
+    """
+
+    def __init__(self, config=None):
+        self._buckets = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def take_token(self, key, rate, burst):
+        """
+        Consume un token del bucket `key`.
+        Returns: (permitido, segundos hasta que haya un token disponible)
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                allowed, retry_after = True, 0
+            else:
+                self._buckets[key] = (tokens, now)
+                allowed, retry_after = False, (1 - tokens) / rate
+            if len(self._buckets) > MAX_TRACKED_BUCKETS:
+                self._prune(now)
+        return allowed, retry_after
+
+    def _prune(self, now):
+        """Olvida los buckets que ya estarían llenos (clientes inactivos)"""
+        for key, (tokens, updated) in list(self._buckets.items()):
+            rate, burst = key[-2], key[-1]
+            if tokens + (now - updated) * rate >= burst:
+                del self._buckets[key]
+
+    def acquire_slot(self, key, limit):
+        with self._lock:
+            in_flight = self._in_flight.get(key, 0)
+            if in_flight >= limit:
+                return False
+            self._in_flight[key] = in_flight + 1
+            return True
+
+    def release_slot(self, key):
+        with self._lock:
+            self._in_flight[key] = max(0, self._in_flight.get(key, 0) - 1)
+
+
+def load_backend(config):
+    """
+    Backend configurado en RATELIMIT_BACKEND ("paquete.modulo:Clase"), creado
+    con la configuración de la app; sin valor, LocalRateLimitBackend
+    """
+    path = config.get('RATELIMIT_BACKEND')
+    if not path:
+        return LocalRateLimitBackend(config)
+    module_name, _, attribute = path.partition(":")
+    if not attribute:
+        raise ValueError("RATELIMIT_BACKEND must be 'package.module:Class'")
+    return getattr(importlib.import_module(module_name), attribute)(config)
+
+
+class RateLimiter:
+
+    def init_app(self, app):
+        app.extensions["ratelimit"] = load_backend(app.config)
+
+    @property
+    def backend(self):
+        """Backend de la app actual (uno local si no se llamó a init_app)"""
+        extensions = current_app.extensions
+        if "ratelimit" not in extensions:
+            extensions["ratelimit"] = LocalRateLimitBackend(current_app.config)
+        return extensions["ratelimit"]
+
+    def limit(self, group, when=None):
+        """
+        Decorador que aplica los límites del grupo `group` (ver RATE_LIMITS en
+        la configuración). `when` permite limitar solo algunas peticiones,
+        p. ej. los listados únicamente cuando llevan búsqueda.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not current_app.config.get('RATELIMIT_ENABLED', True):
+                    return view(*args, **kwargs)
+                if when is not None and not when():
+                    return view(*args, **kwargs)
+
+                limits = current_app.config.get('RATE_LIMITS', DEFAULT_RATE_LIMITS)
+                rate, burst, max_concurrent = limits[group]
+                route = request.endpoint
+
+                backend = self.backend
+
+                allowed, retry_after = backend.take_token(
+                    (route, client_id(), rate, burst), rate, burst)
+                if not allowed:
+                    return rejected(route, "throttled", retry_after)
+
+                slot = (route, "in_flight")
+                if not backend.acquire_slot(slot, max_concurrent):
+                    return rejected(route, "concurrency_rejected", 1)
+
+                metrics.incr("ratelimit_decisions", route=route, decision="allowed")
+                try:
+                    response = current_app.make_response(view(*args, **kwargs))
+                except Exception:
+                    backend.release_slot(slot)
+                    raise
+                if response.is_streamed:
+                    # En los exports en streaming el slot se mantiene
+                    # mientras se envían los datos
+                    response.call_on_close(lambda: backend.release_slot(slot))
+                else:
+                    backend.release_slot(slot)
+                return response
+            return wrapper
+        return decorator
+
+
+def client_id():
+    """Identificador del cliente: su IP (ya resuelta por ProxyFix tras un proxy)"""
+    return request.remote_addr
+
+
+def rejected(route, decision, retry_after):
+    metrics.incr("ratelimit_decisions", route=route, decision=decision)
+    response = jsonify({"error": "Too many requests, please retry later"})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+limiter = RateLimiter()
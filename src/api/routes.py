@@ -2,14 +2,37 @@
 Módulo de rutas de la API
 Gestiona todos los endpoints REST para usuarios y pedidos
 """
-from flask import request, jsonify, Blueprint
-from api.models import db, User, Order
+from flask import request, jsonify, Blueprint, Response, current_app, stream_with_context
+from api.models import (
+    db, User, Order, ORDER_STATUSES,
+    apply_order_summary_delta, apply_order_summary_deltas, record_change, record_changes
+)
+from sqlalchemy.orm import contains_eager, joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.exc import StaleDataError
+from api.idempotency import idempotent
+from api.events import broker, format_sse
+from api.metrics import metrics
+from api.compression import compress_response
+from api.ratelimit import limiter
+from api.archive import (
+    ARCHIVABLE_STATUSES, wants_archived, paginate_orders_with_archive,
+    all_orders_with_archive, order_rows_statement
+)
+from api.change_feed import parse_token, format_token, needs_resync, changes_since
+from api.soft_delete import soft_delete_users, restore_user, get_deleted_user
+from api.order_queue import MAX_CLAIM, claim_orders
+from api.profiling import collapsed_stacks, store_from_config, valid_token
+from api.columnar import EXPORT_MIMETYPES, load_pyarrow, stream_columnar, users_schema, orders_schema
+from sqlalchemy import insert, select
 from flask_cors import CORS
-from datetime import datetime
+from datetime import datetime, timedelta
+import math
 import re
 
 api = Blueprint('api', __name__)
 CORS(api)
+api.after_request(compress_response)
 
 # ============== UTILIDADES ==============
 
@@ -32,6 +55,133 @@ def validate_pagination_params(page, per_page):
     return True, None, None
 
 
+def parse_id(value):
+    """Id entero a partir de un valor JSON (número o cadena), o None"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def entity_etag(entity):
+    """ETag de un usuario o pedido: su versión (ver version_id_col en models.py)"""
+    return str(entity.version)
+
+
+def with_etag(data, entity, status_code):
+    """Respuesta JSON con el ETag de la versión guardada de `entity`"""
+    response = jsonify(data)
+    response.status_code = status_code
+    response.set_etag(entity_etag(entity))
+    return response
+
+
+def check_if_match(entity):
+    """
+    Evalúa la cabecera If-Match contra la versión actual de `entity`.
+    Acepta también el ETag tal y como sale comprimido ("3-gzip", "3-br").
+    Returns: respuesta 412 si no coincide, None si se puede continuar
+    """
+    if not request.if_match:
+        return None
+    etag = entity_etag(entity)
+    if any(request.if_match.contains(tag) for tag in (etag, f"{etag}-gzip", f"{etag}-br")):
+        return None
+    response = jsonify({
+        "error": "Precondition failed: the resource was modified, reload and retry",
+        "current_version": entity.version
+    })
+    response.status_code = 412
+    response.set_etag(etag)
+    return response
+
+
+def version_conflict(entity_name):
+    """409 cuando otra petición guardó una versión nueva entre la lectura y la escritura"""
+    return jsonify({
+        "error": f"{entity_name} was modified by another request, reload and retry"
+    }), 409
+
+
+def has_search():
+    """True si el listado lleva búsqueda (se limita como endpoint costoso)"""
+    return bool(request.args.get('search', '').strip())
+
+
+def parse_date_range(args):
+    """
+    Lee los filtros created_from / created_to (ISO 8601, fecha o fecha y hora).
+    Una fecha sin hora en created_to incluye el día completo.
+    Returns: (created_from, created_to, error_message)
+    """
+    parsed = {}
+    for name in ('created_from', 'created_to'):
+        value = args.get(name, '').strip()
+        if not value:
+            parsed[name] = None
+            continue
+        try:
+            parsed[name] = datetime.fromisoformat(value)
+        except ValueError:
+            return None, None, f"{name} must be an ISO 8601 date"
+        if name == 'created_to' and len(value) == 10:
+            parsed[name] += timedelta(days=1)
+    return parsed['created_from'], parsed['created_to'], None
+
+
+def date_range_criteria(column, created_from, created_to):
+    """Filtros SQL para el rango [created_from, created_to)"""
+    filters = []
+    if created_from:
+        filters.append(column >= created_from)
+    if created_to:
+        filters.append(column < created_to)
+    return filters
+
+
+def parse_status_filter(args):
+    """
+    Lee el filtro status de los listados de pedidos.
+    Returns: (estado o None, mensaje de error o None)
+    """
+    status = args.get('status', '').strip().lower()
+    if status and status not in ORDER_STATUSES:
+        return None, f"Invalid status. Must be one of: {', '.join(ORDER_STATUSES)}"
+    return status or None, None
+
+
+def export_format(args):
+    """
+    Valida el parámetro format de los exports.
+    Returns: (formato, respuesta de error o None)
+    """
+    fmt = args.get('format', 'json').lower()
+    if fmt != 'json' and fmt not in EXPORT_MIMETYPES:
+        return fmt, (jsonify({
+            "error": f"Invalid format. Must be one of: json, {', '.join(EXPORT_MIMETYPES)}"
+        }), 400)
+    if fmt != 'json' and load_pyarrow() is None:
+        return fmt, (jsonify({
+            "error": f"Format {fmt} requires pyarrow, which is not installed"
+        }), 501)
+    return fmt, None
+
+
+def columnar_response(statement, schema_factory, fmt, filename):
+    """Respuesta en streaming con el export en Parquet o Arrow"""
+    pa = load_pyarrow()
+    chunk_size = current_app.config.get('EXPORT_CHUNK_SIZE', 5000)
+    response = Response(
+        stream_with_context(stream_columnar(
+            pa, statement, schema_factory(pa), fmt, chunk_size)),
+        mimetype=EXPORT_MIMETYPES[fmt]
+    )
+    extension = 'parquet' if fmt == 'parquet' else 'arrows'
+    response.headers['Content-Disposition'] = \
+        f'attachment; filename="{filename}.{extension}"'
+    return response
+
+
 # ============== ENDPOINTS DE PRUEBA ==============
 
 @api.route('/hello', methods=['GET'])
@@ -40,9 +190,16 @@ def handle_hello():
     return jsonify({"message": "Backend is running"}), 200
 
 
+@api.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Contadores del proceso actual (decisiones del rate limiter, etc.)"""
+    return jsonify(metrics.snapshot()), 200
+
+
 # ============== ENDPOINTS DE USUARIOS ==============
 
 @api.route('/users', methods=['POST'])
+@idempotent
 def create_user():
     """Crea un nuevo usuario en la base de datos"""
     try:
@@ -64,16 +221,19 @@ def create_user():
         if not validate_email(email):
             return jsonify({"error": "Invalid email format"}), 400
 
-        # Verificar que el email no exista
-        if User.query.filter_by(email=email).first():
+        # Verificar que el email no exista (también entre los usuarios
+        # borrados: siguen ocupando el email hasta que se purgan)
+        if User.query.filter_by(email=email).execution_options(include_deleted=True).first():
             return jsonify({"error": "Email already exists"}), 400
 
         # Crear y guardar el nuevo usuario
         new_user = User(name=name, email=email)
         db.session.add(new_user)
+        db.session.flush()
+        record_change("user", new_user.id, "created")
         db.session.commit()
 
-        return jsonify(new_user.serialize()), 201
+        return with_etag(new_user.serialize(), new_user, 201)
 
     except Exception as e:
         db.session.rollback()
@@ -81,6 +241,7 @@ def create_user():
 
 
 @api.route('/users', methods=['GET'])
+@limiter.limit("search", when=has_search)
 def get_users():
     """Obtiene todos los usuarios con paginación y búsqueda opcional"""
     try:
@@ -130,18 +291,65 @@ def get_users():
 
 @api.route('/users/<int:user_id>/orders', methods=['GET'])
 def get_user_orders(user_id):
-    """Obtiene todos los pedidos de un usuario específico"""
+    """Obtiene los pedidos de un usuario específico con paginación"""
     try:
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 10, type=int)
+
+        is_valid, error_msg, status_code = validate_pagination_params(
+            page, per_page)
+        if not is_valid:
+            return jsonify({"error": error_msg}), status_code
+
+        status, error_msg = parse_status_filter(request.args)
+        if error_msg:
+            return jsonify({"error": error_msg}), 400
+
+        include_archived = wants_archived(request.args)
+
         user = User.query.get(user_id)
         if not user:
             return jsonify({"error": "User not found"}), 404
 
-        orders = Order.query.filter_by(user_id=user_id).all()
+        def criteria(model):
+            filters = [model.user_id == user_id]
+            if status:
+                filters.append(model.status == status)
+            return filters
+
+        # El total sale del resumen del usuario, sin COUNT(*) sobre pedidos,
+        # salvo para los estados archivables sin los archivados: el resumen
+        # no separa cuántos de ellos están archivados
+        if include_archived:
+            orders, _ = paginate_orders_with_archive(
+                criteria, page, per_page, with_total=False)
+            total_orders = getattr(user, f"{status}_order_count") if status \
+                else user.order_count
+        else:
+            exact_count = status in ARCHIVABLE_STATUSES
+            orders_pagination = Order.query.filter(*criteria(Order)).order_by(
+                Order.created_at.desc(), Order.id.desc()
+            ).paginate(
+                page=page,
+                per_page=per_page,
+                error_out=False,
+                count=exact_count
+            )
+            orders = [order.serialize() for order in orders_pagination.items]
+            if exact_count:
+                total_orders = orders_pagination.total
+            elif status:
+                total_orders = getattr(user, f"{status}_order_count")
+            else:
+                total_orders = user.order_count - user.archived_order_count
 
         return jsonify({
             "user": user.serialize(),
-            "orders": [order.serialize() for order in orders],
-            "total_orders": len(orders)
+            "orders": orders,
+            "total_orders": total_orders,
+            "page": page,
+            "per_page": per_page,
+            "total_pages": math.ceil(total_orders / per_page)
         }), 200
 
     except Exception as e:
@@ -149,10 +357,27 @@ def get_user_orders(user_id):
 
 
 @api.route('/users/export', methods=['GET'])
+@limiter.limit("export")
 def export_users():
-    """Exporta todos los usuarios a formato JSON"""
+    """Exporta usuarios a JSON, Parquet o Arrow (?format=) con filtro de fechas"""
     try:
-        users = User.query.all()
+        fmt, error_response = export_format(request.args)
+        if error_response:
+            return error_response
+        created_from, created_to, error_msg = parse_date_range(request.args)
+        if error_msg:
+            return jsonify({"error": error_msg}), 400
+
+        filters = date_range_criteria(User.created_at, created_from, created_to)
+
+        if fmt != 'json':
+            statement = select(
+                User.id, User.name, User.email, User.created_at,
+                User.order_count, User.order_total
+            ).where(*filters).order_by(User.id)
+            return columnar_response(statement, users_schema, fmt, 'users_export')
+
+        users = User.query.filter(*filters).all()
 
         return jsonify({
             "success": True,
@@ -166,6 +391,8 @@ def export_users():
 
 
 @api.route('/users/batch', methods=['POST'])
+@limiter.limit("batch")
+@idempotent
 def batch_create_users():
     """Crea múltiples usuarios en lote desde un array JSON"""
     try:
@@ -181,12 +408,13 @@ def batch_create_users():
         if len(body["users"]) > 1000:
             return jsonify({"error": "Maximum 1000 users per batch"}), 400
 
-        created_users = []
+        new_users = []
         errors = []
 
         # Obtener emails existentes para validación eficiente
         existing_emails = set(
-            email[0].lower() for email in db.session.query(User.email).all()
+            email[0].lower() for email in db.session.query(User.email)
+            .execution_options(include_deleted=True).all()
         )
 
         # Procesar cada usuario del lote
@@ -217,32 +445,37 @@ def batch_create_users():
                                   "error": f"Email {email} already exists"})
                     continue
 
-                # Crear usuario
-                new_user = User(name=name, email=email)
-                db.session.add(new_user)
-                created_users.append(new_user)
+                new_users.append({"name": name, "email": email})
                 existing_emails.add(email)
 
             except Exception as e:
                 errors.append(
                     {"index": index, "data": user_data, "error": str(e)})
 
-        # Confirmar transacción si hay usuarios válidos
-        if created_users:
+        # Crear los usuarios válidos con un único INSERT ... RETURNING y
+        # serializarlos antes del commit, que los expira (sin un SELECT por fila).
+        # Ordenados por id, como en batch_create_orders
+        serialized_users = []
+        if new_users:
+            created_users = sorted(db.session.scalars(
+                insert(User).returning(User), new_users).all(), key=lambda user: user.id)
+            record_changes(
+                "user", [user.id for user in created_users], "created")
+            serialized_users = [user.serialize() for user in created_users]
             db.session.commit()
 
         response = {
             "success": True,
-            "created": len(created_users),
+            "created": len(serialized_users),
             "failed": len(errors),
             "total_processed": len(body["users"]),
-            "users": [user.serialize() for user in created_users]
+            "users": serialized_users
         }
 
         if errors:
             response["errors"] = errors
 
-        return jsonify(response), 201 if created_users else 400
+        return jsonify(response), 201 if serialized_users else 400
 
     except Exception as e:
         db.session.rollback()
@@ -257,6 +490,10 @@ def update_user(user_id):
         if not user:
             return jsonify({"error": "User not found"}), 404
 
+        precondition_failed = check_if_match(user)
+        if precondition_failed:
+            return precondition_failed
+
         body = request.get_json()
         if not body:
             return jsonify({"error": "Request body is required"}), 400
@@ -280,15 +517,20 @@ def update_user(user_id):
             existing_user = User.query.filter(
                 User.email == email,
                 User.id != user_id
-            ).first()
+            ).execution_options(include_deleted=True).first()
             if existing_user:
                 return jsonify({"error": "Email already exists"}), 400
 
             user.email = email
 
+        # El UPDATE compara la versión leída (compare-and-swap)
+        record_change("user", user.id, "updated")
         db.session.commit()
-        return jsonify(user.serialize()), 200
+        return with_etag(user.serialize(), user, 200)
 
+    except StaleDataError:
+        db.session.rollback()
+        return version_conflict("User")
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
@@ -296,26 +538,22 @@ def update_user(user_id):
 
 @api.route('/users/<int:user_id>', methods=['DELETE'])
 def delete_user(user_id):
-    """Elimina un usuario (solo si no tiene pedidos asociados)"""
+    """
+    Borra un usuario y sus pedidos (borrado lógico): deja de aparecer en la
+    API pero se puede restaurar hasta que `flask purge-deleted` lo elimina
+    """
     try:
         user = User.query.get(user_id)
         if not user:
             return jsonify({"error": "User not found"}), 404
 
-        # Verificar que no tenga pedidos
-        order_count = Order.query.filter_by(user_id=user_id).count()
-        if order_count > 0:
-            return jsonify({
-                "error": "Cannot delete user with existing orders",
-                "order_count": order_count
-            }), 400
-
-        db.session.delete(user)
+        _, order_ids = soft_delete_users([user_id])
         db.session.commit()
 
         return jsonify({
             "success": True,
-            "message": f"User {user.name} deleted successfully"
+            "message": f"User {user.name} deleted successfully",
+            "deleted_orders": len(order_ids)
         }), 200
 
     except Exception as e:
@@ -323,9 +561,33 @@ def delete_user(user_id):
         return jsonify({"error": str(e)}), 500
 
 
+@api.route('/users/<int:user_id>/restore', methods=['POST'])
+def restore_deleted_user(user_id):
+    """Restaura un usuario borrado junto con los pedidos que se borraron con él"""
+    try:
+        user = get_deleted_user(user_id)
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+        if not user.is_deleted:
+            return jsonify({"error": "User is not deleted"}), 400
+
+        order_ids = restore_user(user)
+        db.session.commit()
+
+        return with_etag({
+            **user.serialize(),
+            "restored_orders": len(order_ids)
+        }, user, 200)
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+
 # ============== ENDPOINTS DE PEDIDOS ==============
 
 @api.route('/orders', methods=['POST'])
+@idempotent
 def create_order():
     """Crea un nuevo pedido asociado a un usuario"""
     try:
@@ -365,9 +627,20 @@ def create_order():
             amount=amount
         )
         db.session.add(new_order)
+        db.session.flush()
+        record_change("order", new_order.id, "created")
+        apply_order_summary_delta(
+            user_id,
+            count=1,
+            amount=amount,
+            status_deltas={"pending": 1},
+            touch_last_order=True
+        )
         db.session.commit()
 
-        return jsonify(new_order.serialize()), 201
+        order_data = new_order.serialize()
+        broker.publish("order.created", order_data)
+        return with_etag(order_data, new_order, 201)
 
     except Exception as e:
         db.session.rollback()
@@ -375,6 +648,7 @@ def create_order():
 
 
 @api.route('/orders', methods=['GET'])
+@limiter.limit("search", when=has_search)
 def get_orders():
     """Obtiene todos los pedidos con información del usuario, paginación y búsqueda"""
     try:
@@ -390,14 +664,37 @@ def get_orders():
         if not is_valid:
             return jsonify({"error": error_msg}), status_code
 
-        # Query con join para incluir información del usuario
-        query = Order.query.join(User)
-
-        # Aplicar filtros opcionales
-        if user_id:
-            query = query.filter(Order.user_id == user_id)
-        if search:
-            query = query.filter(Order.product_name.ilike(f"%{search}%"))
+        status, error_msg = parse_status_filter(request.args)
+        if error_msg:
+            return jsonify({"error": error_msg}), 400
+
+        # Filtros opcionales, aplicables a pedidos activos y archivados
+        def criteria(model):
+            filters = []
+            if user_id:
+                filters.append(model.user_id == user_id)
+            if status:
+                filters.append(model.status == status)
+            if search:
+                filters.append(model.product_name.ilike(f"%{search}%"))
+            return filters
+
+        if wants_archived(request.args):
+            orders, total = paginate_orders_with_archive(
+                criteria, page, per_page)
+            return jsonify({
+                "orders": orders,
+                "total": total,
+                "page": page,
+                "per_page": per_page,
+                "total_pages": math.ceil(total / per_page),
+                "search": search if search else None
+            }), 200
+
+        # Query con join para incluir información del usuario (cargado en
+        # la misma consulta, sin una consulta extra por pedido)
+        query = Order.query.join(User).options(
+            contains_eager(Order.user)).filter(*criteria(Order))
 
         # Ordenar y paginar
         orders_pagination = query.order_by(Order.created_at.desc()).paginate(
@@ -420,25 +717,56 @@ def get_orders():
 
 
 @api.route('/orders/export', methods=['GET'])
+@limiter.limit("export")
 def export_orders():
-    """Exporta pedidos a formato JSON con filtros opcionales"""
+    """Exporta pedidos a JSON, Parquet o Arrow (?format=) con filtros opcionales"""
     try:
+        fmt, error_response = export_format(request.args)
+        if error_response:
+            return error_response
         user_id = request.args.get('user_id', type=int)
-
-        # Construir query con join
-        query = Order.query.join(User)
-
-        if user_id:
-            query = query.filter(Order.user_id == user_id)
-
-        orders = query.order_by(Order.created_at.desc()).all()
+        created_from, created_to, error_msg = parse_date_range(request.args)
+        if error_msg:
+            return jsonify({"error": error_msg}), 400
+        status, error_msg = parse_status_filter(request.args)
+        if error_msg:
+            return jsonify({"error": error_msg}), 400
+
+        # Todos los filtros se aplican en SQL
+        def criteria(model):
+            filters = [model.user_id == user_id] if user_id else []
+            if status:
+                filters.append(model.status == status)
+            return filters + date_range_criteria(
+                model.created_at, created_from, created_to)
+
+        if fmt != 'json':
+            statement = order_rows_statement(
+                criteria, wants_archived(request.args))
+            return columnar_response(statement, orders_schema, fmt, 'orders_export')
+
+        if wants_archived(request.args):
+            orders = all_orders_with_archive(criteria)
+        else:
+            # Construir query con join
+            query = Order.query.join(User).options(
+                contains_eager(Order.user)).filter(*criteria(Order))
+            orders = [order.serialize()
+                      for order in query.order_by(Order.created_at.desc()).all()]
 
         return jsonify({
             "success": True,
             "total": len(orders),
-            "orders": [order.serialize() for order in orders],
+            "orders": orders,
             "exported_at": datetime.now().isoformat(),
-            "filters": {"user_id": user_id} if user_id else {}
+            "filters": {
+                key: value for key, value in (
+                    ("user_id", user_id),
+                    ("status", status),
+                    ("created_from", request.args.get('created_from')),
+                    ("created_to", request.args.get('created_to'))
+                ) if value
+            }
         }), 200
 
     except Exception as e:
@@ -446,6 +774,8 @@ def export_orders():
 
 
 @api.route('/orders/batch', methods=['POST'])
+@limiter.limit("batch")
+@idempotent
 def batch_create_orders():
     """Crea múltiples pedidos en lote desde un array JSON"""
     try:
@@ -461,8 +791,18 @@ def batch_create_orders():
         if len(body["orders"]) > 1000:
             return jsonify({"error": "Maximum 1000 orders per batch"}), 400
 
-        created_orders = []
+        new_orders = []
         errors = []
+        # Totales por usuario para actualizar su resumen una sola vez
+        summary_deltas = {}
+
+        # Usuarios existentes del lote en una sola consulta
+        requested_user_ids = {
+            parse_id(order_data.get("user_id")) for order_data in body["orders"]
+            if isinstance(order_data, dict)
+        } - {None}
+        existing_users = {user.id: user for user in db.session.scalars(
+            select(User).where(User.id.in_(requested_user_ids)))} if requested_user_ids else {}
 
         # Procesar cada pedido del lote
         for index, order_data in enumerate(body["orders"]):
@@ -498,39 +838,105 @@ def batch_create_orders():
                     continue
 
                 # Verificar que el usuario exista
-                if not User.query.get(user_id):
+                if parse_id(user_id) not in existing_users:
                     errors.append(
                         {"index": index, "error": f"User with id {user_id} not found"})
                     continue
 
-                # Crear pedido
-                new_order = Order(
-                    user_id=user_id,
-                    product_name=product_name,
-                    amount=amount
-                )
-                db.session.add(new_order)
-                created_orders.append(new_order)
+                user_id = parse_id(user_id)
+                new_orders.append(
+                    {"user_id": user_id, "product_name": product_name, "amount": amount})
+                count, total = summary_deltas.get(user_id, (0, 0))
+                summary_deltas[user_id] = (count + 1, total + amount)
 
             except Exception as e:
                 errors.append({"index": index, "error": str(e)})
 
-        # Confirmar transacción si hay pedidos válidos
-        if created_orders:
+        # Crear los pedidos válidos con un único INSERT ... RETURNING y
+        # serializarlos antes del commit, que los expira (sin un SELECT por fila).
+        # sort_by_parameter_order obliga a SQLite a insertar fila a fila: los ids
+        # autoincrementales siguen el orden del lote, así que basta ordenar por id
+        serialized_orders = []
+        if new_orders:
+            created_orders = sorted(db.session.scalars(
+                insert(Order).returning(Order), new_orders).all(), key=lambda order: order.id)
+            for order in created_orders:
+                # El lazy load de order.user no usa el identity map por el criterio
+                # de borrado lógico; se asigna el usuario ya cargado
+                set_committed_value(order, "user", existing_users[order.user_id])
+            record_changes(
+                "order", [order.id for order in created_orders], "created")
+            apply_order_summary_deltas({
+                user_id: (count, total, {"pending": count})
+                for user_id, (count, total) in summary_deltas.items()
+            }, touch_last_order=True)
+            serialized_orders = [order.serialize() for order in created_orders]
             db.session.commit()
 
+        for order_data in serialized_orders:
+            broker.publish("order.created", order_data)
+
         response = {
             "success": True,
-            "created": len(created_orders),
+            "created": len(serialized_orders),
             "failed": len(errors),
             "total_processed": len(body["orders"]),
-            "orders": [order.serialize() for order in created_orders]
+            "orders": serialized_orders
         }
 
         if errors:
             response["errors"] = errors
 
-        return jsonify(response), 201 if created_orders else 400
+        return jsonify(response), 201 if serialized_orders else 400
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+
+@api.route('/orders/claim', methods=['POST'])
+@idempotent
+def claim_pending_orders():
+    """
+    Reserva para un worker los siguientes pedidos pendientes, del más antiguo
+    al más nuevo, sin repartir el mismo pedido a dos workers (ver order_queue.py)
+    """
+    try:
+        body = request.get_json(silent=True) or {}
+
+        worker = body.get("worker")
+        if not isinstance(worker, str) or not worker.strip():
+            return jsonify({"error": "worker is required"}), 400
+        worker = worker.strip()
+        if len(worker) > 100:
+            return jsonify({"error": "worker must be at most 100 characters"}), 400
+
+        limit = parse_id(body.get("limit", 10))
+        if limit is None or limit < 1 or limit > MAX_CLAIM:
+            return jsonify({"error": f"limit must be between 1 and {MAX_CLAIM}"}), 400
+
+        max_lease = current_app.config.get('ORDER_CLAIM_MAX_LEASE_SECONDS', 3600)
+        lease_seconds = parse_id(body.get(
+            "lease_seconds", current_app.config.get('ORDER_CLAIM_LEASE_SECONDS', 300)))
+        if lease_seconds is None or lease_seconds < 1 or lease_seconds > max_lease:
+            return jsonify({
+                "error": f"lease_seconds must be between 1 and {max_lease}"
+            }), 400
+
+        order_ids, expires_at = claim_orders(worker, limit, lease_seconds)
+        db.session.commit()
+
+        # Los pedidos reservados, con su usuario, en una sola consulta
+        orders = Order.query.options(joinedload(Order.user)).filter(
+            Order.id.in_(order_ids)).order_by(Order.created_at, Order.id).all() \
+            if order_ids else []
+
+        return jsonify({
+            "worker": worker,
+            "claimed": len(orders),
+            "claim_expires_at": expires_at.isoformat(),
+            "orders": [order.serialize() for order in orders]
+        }), 200
 
     except Exception as e:
         db.session.rollback()
@@ -545,6 +951,10 @@ def update_order_status(order_id):
         if not order:
             return jsonify({"error": "Order not found"}), 404
 
+        precondition_failed = check_if_match(order)
+        if precondition_failed:
+            return precondition_failed
+
         body = request.get_json()
         if not body:
             return jsonify({"error": "Request body is required"}), 400
@@ -552,19 +962,189 @@ def update_order_status(order_id):
             return jsonify({"error": "Status is required"}), 400
 
         # Validar que el estado sea válido
-        valid_statuses = ["pending", "completed", "cancelled"]
         new_status = body["status"].lower()
 
-        if new_status not in valid_statuses:
+        if new_status not in ORDER_STATUSES:
             return jsonify({
-                "error": f"Invalid status. Must be one of: {', '.join(valid_statuses)}"
+                "error": f"Invalid status. Must be one of: {', '.join(ORDER_STATUSES)}"
             }), 400
 
-        order.status = new_status
+        previous_status = order.status
+        if previous_status != new_status:
+            apply_order_summary_delta(
+                order.user_id,
+                status_deltas={previous_status: -1, new_status: 1}
+            )
+            order.status = new_status
+            record_change("order", order.id, "updated")
+        # El UPDATE compara la versión leída (compare-and-swap)
         db.session.commit()
 
-        return jsonify(order.serialize()), 200
+        order_data = order.serialize()
+        if previous_status != new_status:
+            broker.publish("order.status_changed", {
+                **order_data, "previous_status": previous_status})
+        return with_etag(order_data, order, 200)
 
+    except StaleDataError:
+        db.session.rollback()
+        return version_conflict("Order")
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
+
+
+@api.route('/orders/stream', methods=['GET'])
+def stream_orders():
+    """
+    Server-Sent Events con las altas y cambios de estado de pedidos.
+    Cada conexión ocupa un hilo durante toda su vida, así que se admiten
+    como mucho EVENTS_MAX_STREAMS por proceso; el resto recibe 503 con
+    Retry-After y los hilos quedan libres para las demás peticiones.
+    """
+    heartbeat = current_app.config.get('EVENTS_HEARTBEAT_INTERVAL', 15)
+
+    subscription = broker.subscribe(
+        current_app.config.get('EVENTS_MAX_STREAMS', 2))
+    if subscription is None:
+        metrics.incr("event_streams_rejected")
+        response = jsonify({"error": "Too many open event streams, retry later"})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(heartbeat)
+        return response
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                event = subscription.get(timeout=heartbeat)
+                if event is None:
+                    # Comentario SSE para mantener viva la conexión
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            broker.unsubscribe(subscription)
+
+    response = Response(stream_with_context(generate()),
+                        mimetype='text/event-stream')
+    # Por si el cliente se desconecta antes de empezar a leer el stream
+    response.call_on_close(lambda: broker.unsubscribe(subscription))
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# ============== PROFILING ==============
+
+def profiling_access_error():
+    """
+    Los perfiles exponen SQL y rutas internas: solo con la cabecera
+    X-Profile-Token igual a PROFILING_SECRET
+    Returns: respuesta de error o None si hay acceso
+    """
+    if not current_app.config.get('PROFILING_SECRET'):
+        return jsonify({"error": "Profiling is disabled"}), 404
+    if not valid_token(current_app.config, request.headers.get('X-Profile-Token')):
+        return jsonify({"error": "Invalid or missing X-Profile-Token"}), 403
+    return None
+
+
+@api.route('/profiles', methods=['GET'])
+def list_profiles():
+    """Perfiles guardados, del más reciente al más antiguo (sin las pilas)"""
+    error_response = profiling_access_error()
+    if error_response:
+        return error_response
+    profiles = store_from_config(current_app.config).list()
+    return jsonify({"profiles": profiles, "total": len(profiles)}), 200
+
+
+@api.route('/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """
+    Perfil completo en JSON, o con ?format=collapsed las pilas en formato
+    collapsed para flamegraph.pl, speedscope o inferno
+    """
+    error_response = profiling_access_error()
+    if error_response:
+        return error_response
+    profile = store_from_config(current_app.config).get(profile_id)
+    if not profile:
+        return jsonify({"error": "Profile not found"}), 404
+
+    fmt = request.args.get('format', 'json')
+    if fmt == 'collapsed':
+        response = Response(collapsed_stacks(profile), mimetype='text/plain')
+        response.headers['Content-Disposition'] = \
+            f'attachment; filename="profile-{profile_id}.folded"'
+        return response
+    if fmt != 'json':
+        return jsonify({"error": "Invalid format. Must be one of: json, collapsed"}), 400
+    return jsonify(profile), 200
+
+
+# ============== CHANGE FEED ==============
+
+@api.route('/changes', methods=['GET'])
+def get_changes():
+    """
+    Devuelve los usuarios y pedidos creados, modificados o eliminados desde
+    el token `since`. Cada entidad aparece una sola vez con su estado actual;
+    el cliente guarda `next_since` para la siguiente sincronización.
+    Con un token anterior a lo que conserva el log responde 410 y el cliente
+    debe volver a sincronizar desde since=0.
+    """
+    try:
+        since = parse_token(request.args.get('since'))
+        limit = request.args.get('limit', 500, type=int)
+
+        if since is None:
+            return jsonify({"error": "since must be 0 or a next_since token"}), 400
+        if limit < 1 or limit > 1000:
+            return jsonify({"error": "limit must be between 1 and 1000"}), 400
+
+        if needs_resync(since):
+            return jsonify({
+                "error": "Change log entries after this token were purged, sync again from since=0",
+                "resync_required": True
+            }), 410
+
+        # Recorre el change log en orden (txid, id) sobre su índice
+        changes, has_more = changes_since(since, limit)
+
+        # Quedarse con la última acción de cada entidad
+        latest = {}
+        for change in changes:
+            latest[(change.entity_type, change.entity_id)] = change.action
+
+        def changed_ids(entity_type):
+            return [entity_id for (kind, entity_id), action in latest.items()
+                    if kind == entity_type and action != "deleted"]
+
+        user_ids = changed_ids("user")
+        order_ids = changed_ids("order")
+        users = User.query.filter(User.id.in_(user_ids)).all() if user_ids else []
+        orders = Order.query.options(joinedload(Order.user)).filter(
+            Order.id.in_(order_ids)).all() if order_ids else []
+
+        # Lo que ya no existe se notifica como eliminado
+        found_users = {user.id for user in users}
+        found_orders = {order.id for order in orders}
+        deleted_users = [entity_id for (kind, entity_id), action in latest.items()
+                         if kind == "user" and (action == "deleted" or entity_id not in found_users)]
+        deleted_orders = [entity_id for (kind, entity_id), action in latest.items()
+                          if kind == "order" and (action == "deleted" or entity_id not in found_orders)]
+
+        return jsonify({
+            "users": [user.serialize() for user in users],
+            "orders": [order.serialize() for order in orders],
+            "deleted": {"users": deleted_users, "orders": deleted_orders},
+            "since": format_token(since),
+            "next_since": format_token((changes[-1].txid, changes[-1].id)) if changes
+            else format_token(since),
+            "has_more": has_more
+        }), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,143 @@
+"""
+Borrado lógico de usuarios y pedidos.
+Borrar marca deleted_at en lugar de eliminar la fila: las consultas ORM dejan
+de verla (ver exclude_soft_deleted en models.py) y se puede restaurar.
+`flask purge-deleted` elimina definitivamente, por lotes, lo borrado hace
+más de N días.
+"""
+from datetime import timedelta
+
+from sqlalchemy import delete, exists, select, update
+
+from api.models import (
+    db, User, Order, ArchivedOrder, bump_version, record_changes, refresh_order_summaries
+)
+from api.utils import utcnow
+
+
+def soft_delete_users(user_ids):
+    """
+    Marca como borrados los usuarios y sus pedidos activos, con la misma
+    fecha para que restore_user recupere exactamente esos pedidos.
+    Returns: (ids de usuarios borrados, ids de pedidos borrados)
+    """
+    user_ids = db.session.execute(
+        select(User.id).where(User.id.in_(list(user_ids)))
+    ).scalars().all()
+    if not user_ids:
+        return [], []
+
+    deleted_at = utcnow()
+    order_ids = db.session.execute(
+        select(Order.id).where(Order.user_id.in_(user_ids))
+    ).scalars().all()
+    db.session.execute(
+        update(Order).where(Order.id.in_(order_ids))
+        .values(deleted_at=deleted_at, **bump_version(Order)))
+    db.session.execute(
+        update(User).where(User.id.in_(user_ids))
+        .values(deleted_at=deleted_at, **bump_version(User)))
+
+    record_changes("order", order_ids, "deleted")
+    record_changes("user", user_ids, "deleted")
+    return user_ids, order_ids
+
+
+def soft_delete_orders(order_ids):
+    """
+    Marca como borrados los pedidos y recalcula el resumen de sus usuarios.
+    Returns: ids de los pedidos borrados
+    """
+    rows = db.session.execute(
+        select(Order.id, Order.user_id).where(Order.id.in_(list(order_ids)))
+    ).all()
+    if not rows:
+        return []
+
+    order_ids = [row.id for row in rows]
+    db.session.execute(
+        update(Order).where(Order.id.in_(order_ids))
+        .values(deleted_at=utcnow(), **bump_version(Order)))
+    refresh_order_summaries({row.user_id for row in rows})
+    record_changes("order", order_ids, "deleted")
+    return order_ids
+
+
+def restore_user(user):
+    """
+    Quita la marca de borrado del usuario y de los pedidos que se borraron
+    con él (los borrados antes por separado siguen borrados).
+    Returns: ids de los pedidos restaurados
+    """
+    order_ids = db.session.execute(
+        select(Order.id)
+        .where(Order.user_id == user.id, Order.deleted_at == user.deleted_at)
+        .execution_options(include_deleted=True)
+    ).scalars().all()
+    db.session.execute(
+        update(Order).where(Order.id.in_(order_ids))
+        .values(deleted_at=None, **bump_version(Order)))
+    user.deleted_at = None
+    db.session.flush()
+    refresh_order_summaries([user.id])
+
+    record_changes("user", [user.id], "updated")
+    record_changes("order", order_ids, "updated")
+    return order_ids
+
+
+def get_deleted_user(user_id):
+    """Usuario por id incluyendo los borrados"""
+    return db.session.execute(
+        select(User).where(User.id == user_id).execution_options(include_deleted=True)
+    ).scalar_one_or_none()
+
+
+def purge_cutoff(days):
+    """Fecha límite para eliminar definitivamente lo borrado hace más de `days` días"""
+    return utcnow() - timedelta(days=days)
+
+
+def purge_deleted(cutoff, batch_size=1000):
+    """
+    Elimina definitivamente los pedidos y usuarios borrados antes de `cutoff`,
+    en lotes de `batch_size` filas con una transacción por lote. Los usuarios
+    que aún tienen pedidos (activos, borrados recientes o archivados) se
+    conservan borrados hasta que se puedan eliminar.
+    Returns: (pedidos eliminados, usuarios eliminados)
+    """
+    purged_orders = 0
+    while True:
+        ids = db.session.execute(
+            select(Order.id)
+            .where(Order.deleted_at < cutoff)
+            .order_by(Order.id)
+            .limit(batch_size)
+            .execution_options(include_deleted=True)
+        ).scalars().all()
+        if not ids:
+            break
+        db.session.execute(delete(Order).where(Order.id.in_(ids)))
+        db.session.commit()
+        purged_orders += len(ids)
+
+    purged_users = 0
+    while True:
+        ids = db.session.execute(
+            select(User.id)
+            .where(
+                User.deleted_at < cutoff,
+                ~exists().where(Order.user_id == User.id),
+                ~exists().where(ArchivedOrder.user_id == User.id)
+            )
+            .order_by(User.id)
+            .limit(batch_size)
+            .execution_options(include_deleted=True)
+        ).scalars().all()
+        if not ids:
+            break
+        db.session.execute(delete(User).where(User.id.in_(ids)))
+        db.session.commit()
+        purged_users += len(ids)
+
+    return purged_orders, purged_users
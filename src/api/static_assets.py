@@ -0,0 +1,132 @@
+"""
+Servidor de los ficheros estáticos del SPA (carpeta dist/ de Vite).
+Se construye un manifiesto en memoria con el contenido de cada fichero, su
+ETag y sus variantes gzip/brotli precalculadas, de forma que las peticiones
+no tocan el disco. Los assets que Vite genera con hash en assets/ se cachean
+como inmutables durante un año; index.html y el resto (incluido lo que Vite
+copia sin hash desde public/) se revalidan siempre.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+
+from flask import Response
+
+from api.utils import negotiate_encoding
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+COMPRESSIBLE_EXTENSIONS = {
+    ".html", ".js", ".mjs", ".css", ".json", ".map", ".svg", ".txt", ".xml", ".ico",
+}
+MIN_COMPRESS_SIZE = 1024
+
+# Nombres generados por Vite (build.assetsDir): assets/index-B2x9Kf_a.js,
+# assets/logo-3f8a1c2d.svg. El hash son exactamente 8 caracteres
+HASHED_ASSETS_DIR = "assets/"
+HASHED_NAME = re.compile(r"-[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+$")
+
+
+class StaticAsset:
+
+    def __init__(self, relative_path, data):
+        self.mimetype = mimetypes.guess_type(relative_path)[0] or "application/octet-stream"
+        self.etag = hashlib.sha256(data).hexdigest()[:32]
+        self.variants = {None: data}
+        if is_hashed_asset(relative_path):
+            self.cache_control = IMMUTABLE_CACHE_CONTROL
+        else:
+            self.cache_control = REVALIDATE_CACHE_CONTROL
+
+        extension = os.path.splitext(relative_path)[1].lower()
+        if extension in COMPRESSIBLE_EXTENSIONS and len(data) >= MIN_COMPRESS_SIZE:
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(compressed) < len(data):
+                self.variants["gzip"] = compressed
+            if brotli is not None:
+                compressed = brotli.compress(data, quality=11)
+                if len(compressed) < len(data):
+                    self.variants["br"] = compressed
+
+    def etag_for(self, encoding):
+        """ETag fuerte distinto por cada representación (codificación)"""
+        return f"{self.etag}-{encoding}" if encoding else self.etag
+
+
+def is_hashed_asset(relative_path):
+    if not relative_path.startswith(HASHED_ASSETS_DIR):
+        return False
+    return HASHED_NAME.search(os.path.basename(relative_path)) is not None
+
+
+class StaticManifest:
+
+    def __init__(self, root, auto_reload=False):
+        self.root = os.path.realpath(root)
+        self.auto_reload = auto_reload
+        self._assets = None
+        self._root_mtime = None
+        self._lock = threading.Lock()
+
+    def _root_changed(self):
+        try:
+            return os.stat(self.root).st_mtime != self._root_mtime
+        except OSError:
+            return False
+
+    def _load(self):
+        assets = {}
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                full_path = os.path.join(directory, filename)
+                relative_path = os.path.relpath(full_path, self.root).replace(os.sep, "/")
+                with open(full_path, "rb") as file:
+                    assets[relative_path] = StaticAsset(relative_path, file.read())
+        self._assets = assets
+        self._root_mtime = os.stat(self.root).st_mtime if os.path.isdir(self.root) else None
+
+    def load(self):
+        """Construye el manifiesto ya (si no, se construye en la primera petición)"""
+        with self._lock:
+            self._load()
+
+    def get(self, relative_path):
+        if self._assets is None or (self.auto_reload and self._root_changed()):
+            with self._lock:
+                if self._assets is None or (self.auto_reload and self._root_changed()):
+                    self._load()
+        return self._assets.get(relative_path)
+
+    def serve(self, request, path):
+        """
+        Respuesta para `path`. Las rutas que no son ficheros devuelven
+        index.html para que el router del SPA las resuelva.
+        """
+        asset = self.get(path) or self.get("index.html")
+        if asset is None:
+            return Response("Not Found", status=404, mimetype="text/plain")
+
+        available = [encoding for encoding in ("br", "gzip") if encoding in asset.variants]
+        encoding = negotiate_encoding(request.accept_encodings, available)
+        etag = asset.etag_for(encoding)
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(asset.variants[encoding], mimetype=asset.mimetype)
+            if encoding:
+                response.headers["Content-Encoding"] = encoding
+
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = asset.cache_control
+        if len(asset.variants) > 1:
+            response.vary.add("Accept-Encoding")
+        return response
@@ -1,3 +1,4 @@
+from datetime import datetime, timezone
 from flask import jsonify, url_for
 
 class APIException(Exception):
@@ -15,6 +16,21 @@ class APIException(Exception):
         rv['message'] = self.message
         return rv
 
+def utcnow():
+    """Fecha actual en UTC sin zona horaria (igual que func.now() en la BD)"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def negotiate_encoding(accept_encodings, available=("br", "gzip")):
+    """
+    Elige la codificación de contenido según la cabecera Accept-Encoding
+    (request.accept_encodings), en el orden de preferencia de `available`.
+    Returns: la codificación elegida o None para enviar sin comprimir
+    """
+    for encoding in available:
+        if accept_encodings.quality(encoding) > 0:
+            return encoding
+    return None
+
 def has_no_empty_params(rule):
     defaults = rule.defaults if rule.defaults is not None else ()
     arguments = rule.arguments if rule.arguments is not None else ()
@@ -2,71 +2,94 @@
 This module takes care of starting the API Server, Loading the DB and Adding the endpoints
 """
 import os
-from flask import Flask, request, jsonify, url_for, send_from_directory
-from flask_migrate import Migrate
-from flask_swagger import swagger
+from flask import Flask, jsonify, request
 from api.utils import APIException, generate_sitemap
+from api.config import default_config
 from api.models import db
 from api.routes import api
-from api.admin import setup_admin
-from api.commands import setup_commands
-
-# from models import Person
+from api.ratelimit import limiter
+from api.static_assets import StaticManifest
 
 ENV = "development" if os.getenv("FLASK_DEBUG") == "1" else "production"
 static_file_dir = os.path.join(os.path.dirname(
     os.path.realpath(__file__)), '../dist/')
-app = Flask(__name__)
-app.url_map.strict_slashes = False
-
-# database condiguration
-db_url = os.getenv("DATABASE_URL")
-if db_url is not None:
-    app.config['SQLALCHEMY_DATABASE_URI'] = db_url.replace(
-        "postgres://", "postgresql://")
-else:
-    app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:////tmp/test.db"
-
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-MIGRATE = Migrate(app, db, compare_type=True)
-db.init_app(app)
-
-# add the admin
-setup_admin(app)
-
-# add the admin
-setup_commands(app)
-
-# Add all endpoints form the API with a "api" prefix
-app.register_blueprint(api, url_prefix='/api')
-
-# Handle/serialize errors like a JSON object
-
-
-@app.errorhandler(APIException)
-def handle_invalid_usage(error):
-    return jsonify(error.to_dict()), error.status_code
-
-# generate sitemap with all your endpoints
-
 
-@app.route('/')
-def sitemap():
-    if ENV == "development":
-        return generate_sitemap(app)
-    return send_from_directory(static_file_dir, 'index.html')
 
-# any other endpoint will try to serve it like a static file
-@app.route('/<path:path>', methods=['GET'])
-def serve_any_other_file(path):
-    if not os.path.isfile(os.path.join(static_file_dir, path)):
-        path = 'index.html'
-    response = send_from_directory(static_file_dir, path)
-    response.cache_control.max_age = 0  # avoid cache memory
-    return response
+def create_app(config=None, with_cli=True):
+    """
+    Application factory. `config` es una clase u objeto de api.config (por
+    defecto según FLASK_DEBUG) o un dict con valores que se aplican encima.
+    No abre conexiones a la BD, así que gunicorn puede crear la app una sola
+    vez en el master (--preload) y compartir su memoria entre workers. Con
+    with_cli=False se omiten Flask-Migrate (que importa alembic) y los
+    comandos, que solo se usan desde el CLI de flask, y (fuera de
+    desarrollo) se construye ya el manifiesto de dist/.
+    """
+    app = Flask(__name__)
+    app.url_map.strict_slashes = False
+
+    app.config.from_object(default_config())
+    if isinstance(config, dict):
+        app.config.update(config)
+    elif config is not None:
+        app.config.from_object(config)
+
+    db.init_app(app)
+
+    if with_cli:
+        from flask_migrate import Migrate
+        from api.commands import setup_commands
+        Migrate(app, db, compare_type=True)
+        setup_commands(app)
+
+    # add the admin (ENABLE_ADMIN=0 lo desactiva y evita importar flask_admin)
+    if app.config['ENABLE_ADMIN']:
+        from api.admin import setup_admin
+        setup_admin(app)
+
+    # Add all endpoints form the API with a "api" prefix
+    app.register_blueprint(api, url_prefix='/api')
+    limiter.init_app(app)
+
+    # profiling bajo demanda, solo si hay secreto (ver api/profiling.py)
+    if app.config['PROFILING_SECRET']:
+        from api.profiling import ProfilingMiddleware
+        app.wsgi_app = ProfilingMiddleware(app.wsgi_app, app.config, app.url_map)
+
+    # IP real del cliente detrás de los proxies de confianza (la usa el rate limiting)
+    if app.config['TRUSTED_PROXY_HOPS']:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXY_HOPS'])
+
+    # Handle/serialize errors like a JSON object
+    @app.errorhandler(APIException)
+    def handle_invalid_usage(error):
+        return jsonify(error.to_dict()), error.status_code
+
+    # manifiesto en memoria de dist/ (en desarrollo se recarga tras cada build)
+    static_files = StaticManifest(
+        static_file_dir, auto_reload=ENV == "development")
+    # En el proceso web se comprime el bundle aquí, antes del fork: los
+    # workers comparten el manifiesto en lugar de construir cada uno el suyo
+    if not with_cli and ENV != "development":
+        static_files.load()
+
+    # generate sitemap with all your endpoints
+    @app.route('/')
+    def sitemap():
+        if ENV == "development":
+            return generate_sitemap(app)
+        return static_files.serve(request, 'index.html')
+
+    # any other endpoint will try to serve it like a static file
+    @app.route('/<path:path>', methods=['GET'])
+    def serve_any_other_file(path):
+        return static_files.serve(request, path)
+
+    return app
 
 
 # this only runs if `$ python src/main.py` is executed
 if __name__ == '__main__':
     PORT = int(os.environ.get('PORT', 3001))
-    app.run(host='0.0.0.0', port=PORT, debug=True)
+    create_app().run(host='0.0.0.0', port=PORT, debug=True)
@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import apiService from "../services/apiService";
 
 /**
@@ -183,9 +183,12 @@ export const useOrders = (initialFilters = {}) => {
     setError(null);
 
     try {
+      // Enviar la versión mostrada para no pisar cambios de otra sesión
+      const current = orders.find((order) => order.id === orderId);
       const updatedOrder = await apiService.orders.updateStatus(
         orderId,
-        newStatus
+        newStatus,
+        current?.version
       );
       await fetchOrders(
         pagination.page,
@@ -224,6 +227,51 @@ export const useOrders = (initialFilters = {}) => {
     fetchOrders(1, pagination.per_page, filters, searchTerm);
   }, []);
 
+  // Página, filtros y búsqueda actuales para los eventos del stream, que se
+  // suscribe una sola vez al montar el componente
+  const currentQuery = useRef({});
+  currentQuery.current = {
+    page: pagination.page,
+    per_page: pagination.per_page,
+    filters,
+    searchTerm,
+  };
+
+  // Aplicar en vivo los cambios hechos desde otras pestañas. El evento de
+  // cambio de estado trae el pedido completo, incluida la versión que usa
+  // If-Match; un pedido nuevo puede entrar en la página actual y cambia los
+  // totales, así que se recarga la página
+  useEffect(() => {
+    let refetchTimer = null;
+
+    // Las recargas seguidas (un lote de pedidos nuevos) se agrupan en una
+    const scheduleRefetch = () => {
+      clearTimeout(refetchTimer);
+      refetchTimer = setTimeout(() => {
+        const { page, per_page, filters, searchTerm } = currentQuery.current;
+        fetchOrders(page, per_page, filters, searchTerm);
+      }, 500);
+    };
+
+    const source = apiService.orders.subscribe({
+      "order.status_changed": ({ previous_status, ...changedOrder }) =>
+        setOrders((prev) =>
+          prev.map((order) =>
+            order.id === changedOrder.id
+              ? { ...order, ...changedOrder }
+              : order
+          )
+        ),
+      "order.created": scheduleRefetch,
+      // El servidor descartó eventos de esta conexión (su cola se llenó)
+      resync: scheduleRefetch,
+    });
+    return () => {
+      clearTimeout(refetchTimer);
+      source.close();
+    };
+  }, []);
+
   return {
     orders,
     loading,
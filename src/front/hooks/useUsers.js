@@ -68,7 +68,13 @@ export const useUsers = (initialPage = 1, perPage = 10) => {
    */
   const updateUser = async (userId, userData) => {
     try {
-      const updatedUser = await apiService.users.update(userId, userData);
+      // Enviar la versión mostrada para no pisar cambios de otra sesión
+      const current = users.find((user) => user.id === userId);
+      const updatedUser = await apiService.users.update(
+        userId,
+        userData,
+        current?.version
+      );
       await fetchUsers(pagination.page);
       return { success: true, user: updatedUser };
     } catch (err) {
@@ -28,11 +28,11 @@ const request = async (endpoint, options = {}) => {
     }
 
     const config = {
+      ...options,
       headers: {
         "Content-Type": "application/json",
         ...options.headers,
       },
-      ...options,
     };
 
     const response = await fetch(`${API_BASE_URL}${endpoint}`, config);
@@ -43,6 +43,13 @@ const request = async (endpoint, options = {}) => {
   }
 };
 
+/**
+ * Cabecera If-Match con la versión leída del recurso: si otro cambio la
+ * ha modificado, la API responde 412 en lugar de sobrescribirlo
+ */
+const ifMatch = (version) =>
+  version !== undefined && version !== null ? { "If-Match": `"${version}"` } : {};
+
 /**
  * Construye query string a partir de un objeto de parámetros
  */
@@ -78,18 +85,25 @@ export const apiService = {
       }),
 
     // Actualizar un usuario
-    update: (userId, userData) =>
+    update: (userId, userData, version) =>
       request(`/api/users/${userId}`, {
         method: "PUT",
+        headers: ifMatch(version),
         body: JSON.stringify(userData),
       }),
 
-    // Eliminar un usuario (solo si no tiene pedidos)
+    // Eliminar un usuario y sus pedidos (borrado lógico, se puede restaurar)
     delete: (userId) =>
       request(`/api/users/${userId}`, {
         method: "DELETE",
       }),
 
+    // Restaurar un usuario borrado junto con sus pedidos
+    restore: (userId) =>
+      request(`/api/users/${userId}/restore`, {
+        method: "POST",
+      }),
+
     // Crear usuarios en lote
     batchCreate: (batchData) =>
       request("/api/users/batch", {
@@ -97,8 +111,9 @@ export const apiService = {
         body: JSON.stringify(batchData),
       }),
 
-    // Obtener pedidos de un usuario
-    getOrders: (userId) => request(`/api/users/${userId}/orders`),
+    // Obtener pedidos de un usuario (paginados, con resumen del usuario)
+    getOrders: (userId, params = {}) =>
+      request(`/api/users/${userId}/orders${buildQueryString(params)}`),
 
     // Exportar usuarios a JSON
     export: () => request("/api/users/export"),
@@ -120,9 +135,10 @@ export const apiService = {
       }),
 
     // Actualizar estado de un pedido
-    updateStatus: (orderId, status) =>
+    updateStatus: (orderId, status, version) =>
       request(`/api/orders/${orderId}`, {
         method: "PATCH",
+        headers: ifMatch(version),
         body: JSON.stringify({ status }),
       }),
 
@@ -136,6 +152,52 @@ export const apiService = {
         method: "POST",
         body: JSON.stringify(batchData),
       }),
+
+    // Reservar los siguientes pedidos pendientes para un worker
+    claim: (worker, limit = 10, leaseSeconds) =>
+      request("/api/orders/claim", {
+        method: "POST",
+        body: JSON.stringify({ worker, limit, lease_seconds: leaseSeconds }),
+      }),
+
+    // Suscribirse a eventos de pedidos (SSE). handlers: { "order.created": fn, ... }
+    // El servidor limita las conexiones abiertas y responde 503 por encima;
+    // EventSource no reintenta tras un error HTTP, así que se reabre pasado un rato
+    subscribe: (handlers = {}, retryDelay = 15000) => {
+      let source = null;
+      let retryTimer = null;
+      let closed = false;
+
+      const open = () => {
+        source = new EventSource(`${API_BASE_URL}/api/orders/stream`);
+        Object.entries(handlers).forEach(([eventType, handler]) => {
+          source.addEventListener(eventType, (event) =>
+            handler(JSON.parse(event.data))
+          );
+        });
+        source.onerror = () => {
+          if (!closed && source.readyState === EventSource.CLOSED) {
+            retryTimer = setTimeout(open, retryDelay);
+          }
+        };
+      };
+
+      open();
+      return {
+        close: () => {
+          closed = true;
+          clearTimeout(retryTimer);
+          source.close();
+        },
+      };
+    },
+  },
+
+  // ========== CAMBIOS ==========
+  changes: {
+    // Usuarios y pedidos modificados desde un token (sincronización incremental)
+    since: (since = 0, params = {}) =>
+      request(`/api/changes${buildQueryString({ since, ...params })}`),
   },
 };
 
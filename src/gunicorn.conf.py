@@ -0,0 +1,22 @@
+"""
+Configuración de gunicorn. Se carga automáticamente porque el Procfile y
+render.yaml arrancan con --chdir ./src/ y gunicorn busca gunicorn.conf.py
+en el directorio de trabajo.
+"""
+import os
+
+# Importar y crear la app una sola vez en el master: los workers la heredan
+# con fork() y comparten esas páginas de memoria (copy-on-write)
+preload_app = True
+
+# Hilos por worker: las conexiones SSE de /api/orders/stream ocupan un hilo
+# (como mucho EVENTS_MAX_STREAMS, por defecto la mitad)
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+
+
+def post_fork(server, worker):
+    """Cada worker abre sus propias conexiones en lugar de heredar las del master"""
+    from api.models import db
+    from wsgi import application
+    with application.app_context():
+        db.engine.dispose(close=False)
@@ -0,0 +1,88 @@
+"""
+Fixtures de pytest para levantar instancias aisladas de la app.
+
+- app: una app por proceso de pytest con su propia BD SQLite, en un fichero
+  temporal (por defecto) o en memoria con --test-db=memory. Con pytest-xdist
+  (`pytest -n auto`) cada worker tiene su propio directorio temporal, así que
+  los tests se reparten entre núcleos sin compartir BD.
+- db: cada test corre dentro de una transacción que se deshace al terminar;
+  los commit() de las rutas se convierten en savepoints.
+- client: cliente de pruebas de Flask sobre esa transacción.
+- user: un usuario creado a través de la API.
+"""
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from app import create_app
+from api.config import TestingConfig, engine_options
+from api.models import db as _db
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--test-db", choices=("file", "memory"), default="file",
+        help="SQLite de los tests: fichero temporal por worker o en memoria")
+
+
+def _enable_sqlite_savepoints(engine):
+    """
+    pysqlite gestiona las transacciones por su cuenta y rompe los SAVEPOINT;
+    receta de SQLAlchemy para que sea el engine quien emita BEGIN.
+    """
+    @event.listens_for(engine, "connect")
+    def do_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def do_begin(connection):
+        connection.exec_driver_sql("BEGIN")
+
+
+@pytest.fixture(scope="session")
+def app(request, tmp_path_factory):
+    if request.config.getoption("--test-db") == "memory":
+        uri = "sqlite://"
+    else:
+        uri = f"sqlite:///{tmp_path_factory.mktemp('db') / 'test.db'}"
+
+    class Config(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = uri
+        SQLALCHEMY_ENGINE_OPTIONS = engine_options(uri)
+
+    app = create_app(Config, with_cli=False)
+    with app.app_context():
+        _enable_sqlite_savepoints(_db.engine)
+        _db.create_all()
+    yield app
+    with app.app_context():
+        _db.engine.dispose()
+
+
+@pytest.fixture
+def db(app):
+    with app.app_context():
+        connection = _db.engine.connect()
+        transaction = connection.begin()
+        original_session = _db.session
+        _db.session = scoped_session(sessionmaker(
+            bind=connection, join_transaction_mode="create_savepoint"))
+        try:
+            yield _db
+        finally:
+            _db.session.remove()
+            _db.session = original_session
+            transaction.rollback()
+            connection.close()
+
+
+@pytest.fixture
+def client(app, db):
+    return app.test_client()
+
+
+@pytest.fixture
+def user(client):
+    response = client.post("/api/users", json={"name": "Ana", "email": "ana@example.com"})
+    assert response.status_code == 201
+    return response.get_json()
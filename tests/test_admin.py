@@ -0,0 +1,84 @@
+"""Vistas de Flask-Admin: change log en la transacción del formulario y eventos SSE"""
+import pytest
+
+from api.admin import OrderAdmin, UserAdmin
+from api.events import broker
+from api.models import ChangeLog, Order, User
+
+
+@pytest.fixture
+def admin_request(app, db, monkeypatch):
+    # flash() de las acciones necesita la sesión de Flask
+    monkeypatch.setattr(app, "secret_key", "test")
+    with app.test_request_context("/admin/order/action/", method="POST"):
+        yield
+
+
+@pytest.fixture
+def events():
+    subscription = broker.subscribe()
+
+    def drain():
+        """Eventos publicados desde la última llamada"""
+        received = []
+        while (event := subscription.get(timeout=0.01)) is not None:
+            received.append(event)
+        return received
+
+    yield drain
+    broker.unsubscribe(subscription)
+
+
+def create_orders(client, user, count):
+    return [client.post("/api/orders", json={
+        "user_id": user["id"], "product_name": "Teclado", "amount": 10}).get_json()["id"]
+        for _ in range(count)]
+
+
+def changes(entity_type):
+    return ChangeLog.query.filter_by(entity_type=entity_type).count()
+
+
+def test_form_edit_records_change_and_publishes_status(client, db, user, admin_request, events):
+    order_id, = create_orders(client, user, 1)
+    events()
+    view = OrderAdmin(Order, db.session)
+    order = db.session.get(Order, order_id)
+    before = changes("order")
+
+    # Lo que hace Flask-Admin al guardar: on_model_change, commit, after_model_change
+    order.status = "completed"
+    view.on_model_change(None, order, False)
+    assert changes("order") == before + 1
+    db.session.commit()
+    view.after_model_change(None, order, False)
+
+    event, = events()
+    assert event["type"] == "order.status_changed"
+    assert event["data"]["previous_status"] == "pending"
+    assert event["data"]["status"] == "completed"
+
+
+def test_user_form_records_change_before_commit(client, db, user, admin_request):
+    view = UserAdmin(User, db.session)
+    model = db.session.get(User, user["id"])
+    before = changes("user")
+
+    model.name = "Ana María"
+    view.on_model_change(None, model, False)
+
+    assert changes("user") == before + 1
+
+
+def test_bulk_status_action_publishes_changed_orders(client, db, user, admin_request, events):
+    completed, pending, cancelled = create_orders(client, user, 3)
+    client.patch(f"/api/orders/{completed}", json={"status": "completed"})
+    events()
+
+    OrderAdmin(Order, db.session)._set_status([completed, pending, cancelled], "completed")
+
+    published = events()
+    assert [(event["data"]["id"], event["data"]["previous_status"]) for event in published] \
+        == [(pending, "pending"), (cancelled, "pending")]
+    summary = db.session.get(User, user["id"]).order_summary()
+    assert summary["by_status"] == {"pending": 0, "completed": 3, "cancelled": 0}
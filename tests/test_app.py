@@ -0,0 +1,34 @@
+"""create_app(config) y aislamiento de los fixtures entre tests"""
+from app import create_app
+from api.config import TestingConfig
+from api.models import User
+
+
+def test_dict_config_is_applied_over_defaults():
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "ENABLE_ADMIN": False},
+                     with_cli=False)
+
+    assert app.config["SQLALCHEMY_DATABASE_URI"] == "sqlite://"
+    assert app.config["ENABLE_ADMIN"] is False
+    assert "migrate" not in app.extensions
+
+
+def test_config_class_and_cli_setup():
+    app = create_app(TestingConfig)
+
+    assert app.config["TESTING"] is True
+    assert "migrate" in app.extensions
+    assert "admin" not in app.extensions
+
+
+def test_route_commit_inside_test_transaction(client, db):
+    response = client.post("/api/users", json={"name": "Ana", "email": "ana@example.com"})
+
+    assert response.status_code == 201
+    assert User.query.count() == 1
+
+
+def test_each_test_starts_with_empty_database(client, db):
+    # El usuario del test anterior se deshizo con su transacción
+    assert User.query.count() == 0
+    assert client.get("/api/users").get_json()["users"] == []
@@ -0,0 +1,76 @@
+"""Archivo de pedidos y ?include_archived=1 (api/archive.py)"""
+from api.archive import archive_cutoff, archive_orders
+
+
+def create_order(client, user, status="pending", amount=10):
+    order = client.post("/api/orders", json={
+        "user_id": user["id"], "product_name": "Teclado", "amount": amount}).get_json()
+    if status != "pending":
+        client.patch(f"/api/orders/{order['id']}", json={"status": status})
+    return order
+
+
+def archive_all():
+    """Archiva todos los pedidos archivables, sin importar su antigüedad"""
+    return archive_orders(archive_cutoff(-1))
+
+
+def test_archived_orders_of_deleted_users_are_not_counted(client, db, user):
+    create_order(client, user, status="completed")
+    archive_all()
+    client.delete(f"/api/users/{user['id']}")
+
+    response = client.get("/api/orders?include_archived=1").get_json()
+
+    assert response["orders"] == []
+    assert response["total"] == 0
+
+
+def test_archive_moves_only_finished_orders(client, db, user):
+    pending = create_order(client, user)
+    completed = create_order(client, user, status="completed")
+    cancelled = create_order(client, user, status="cancelled")
+
+    assert archive_all() == 2
+
+    active = client.get("/api/orders").get_json()
+    assert [order["id"] for order in active["orders"]] == [pending["id"]]
+    assert active["total"] == 1
+
+    combined = client.get("/api/orders?include_archived=1").get_json()
+    assert {(order["id"], order["archived"]) for order in combined["orders"]} == {
+        (pending["id"], False), (completed["id"], True), (cancelled["id"], True)}
+    assert combined["total"] == 3
+    assert all(order["user_name"] == "Ana" for order in combined["orders"])
+
+
+def test_include_archived_applies_filters_to_both_tables(client, db, user):
+    create_order(client, user, status="completed")
+    archive_all()
+    create_order(client, user, status="completed")
+    create_order(client, user)
+
+    response = client.get(
+        "/api/orders", query_string={"include_archived": "true", "status": "completed"}).get_json()
+
+    assert response["total"] == 2
+    assert sorted(order["archived"] for order in response["orders"]) == [False, True]
+
+
+def test_user_orders_totals_with_and_without_archive(client, db, user):
+    create_order(client, user, status="completed", amount=10)
+    create_order(client, user, amount=5)
+    archive_all()
+    path = f"/api/users/{user['id']}/orders"
+
+    active = client.get(path).get_json()
+    combined = client.get(path, query_string={"include_archived": 1}).get_json()
+    completed = client.get(path, query_string={"include_archived": 1, "status": "completed"}).get_json()
+
+    # El resumen sigue contando los archivados
+    assert active["user"]["order_summary"]["order_count"] == 2
+    assert active["user"]["order_summary"]["total_amount"] == 15
+    assert (len(active["orders"]), active["total_orders"]) == (1, 1)
+    assert (len(combined["orders"]), combined["total_orders"]) == (2, 2)
+    assert completed["total_orders"] == 1
+    assert completed["orders"][0]["archived"] is True
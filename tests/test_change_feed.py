@@ -0,0 +1,83 @@
+"""GET /api/changes: tokens de sincronización, bajas y 410 tras purgar el log"""
+from datetime import timedelta
+
+from api.change_feed import purge_change_log
+from api.utils import utcnow
+
+
+def create_order(client, user, amount=10):
+    return client.post("/api/orders", json={
+        "user_id": user["id"], "product_name": "Teclado", "amount": amount}).get_json()
+
+
+def sync(client, since="0", **params):
+    return client.get("/api/changes", query_string={"since": since, **params})
+
+
+def test_full_sync_then_incremental(client, db, user):
+    order = create_order(client, user)
+
+    first = sync(client).get_json()
+    assert [u["id"] for u in first["users"]] == [user["id"]]
+    assert [o["id"] for o in first["orders"]] == [order["id"]]
+    assert first["has_more"] is False
+
+    # Sin cambios, el token no avanza
+    unchanged = sync(client, first["next_since"]).get_json()
+    assert (unchanged["users"], unchanged["orders"]) == ([], [])
+    assert unchanged["next_since"] == first["next_since"]
+
+    client.patch(f"/api/orders/{order['id']}", json={"status": "completed"})
+    changed = sync(client, first["next_since"]).get_json()
+    assert [(o["id"], o["status"]) for o in changed["orders"]] == [(order["id"], "completed")]
+    # El resumen del usuario también cambió
+    assert [u["id"] for u in changed["users"]] == [user["id"]]
+
+
+def test_limit_pages_through_the_log(client, db, user):
+    for _ in range(3):
+        create_order(client, user)
+
+    seen, since = set(), "0"
+    while True:
+        page = sync(client, since, limit=2).get_json()
+        seen.update(("order", o["id"]) for o in page["orders"])
+        seen.update(("user", u["id"]) for u in page["users"])
+        since = page["next_since"]
+        if not page["has_more"]:
+            break
+
+    assert len([kind for kind, _ in seen if kind == "order"]) == 3
+    assert ("user", user["id"]) in seen
+
+
+def test_deleted_user_and_orders_are_reported(client, db, user):
+    order = create_order(client, user)
+    since = sync(client).get_json()["next_since"]
+
+    client.delete(f"/api/users/{user['id']}")
+    response = sync(client, since).get_json()
+
+    assert response["deleted"] == {"users": [user["id"]], "orders": [order["id"]]}
+    assert (response["users"], response["orders"]) == ([], [])
+
+
+def test_invalid_token_is_400(client, db):
+    assert sync(client, "abc").status_code == 400
+    assert sync(client, limit=0).status_code == 400
+
+
+def test_token_before_purged_entries_is_410(client, db, user):
+    stale = sync(client).get_json()["next_since"]
+    create_order(client, user)
+    create_order(client, user)
+    current = sync(client).get_json()["next_since"]
+
+    assert purge_change_log(utcnow() + timedelta(minutes=1)) > 0
+
+    response = sync(client, stale)
+    assert response.status_code == 410
+    assert response.get_json()["resync_required"] is True
+    # La última entrada se conserva: el token que ya la alcanzó sigue valiendo
+    assert sync(client, current).status_code == 200
+    assert sync(client).status_code == 200
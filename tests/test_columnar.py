@@ -0,0 +1,78 @@
+"""Exports Parquet y Arrow (?format=): lectura de vuelta con pyarrow"""
+import io
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+import api.routes
+from api.archive import archive_cutoff, archive_orders
+
+
+@pytest.fixture
+def orders(app, client, db, user, monkeypatch):
+    # Bloques pequeños para que el export tenga varios RecordBatch
+    monkeypatch.setitem(app.config, "EXPORT_CHUNK_SIZE", 2)
+    created = [client.post("/api/orders", json={
+        "user_id": user["id"], "product_name": f"Producto {i}", "amount": i + 0.5}).get_json()
+        for i in range(5)]
+    client.patch(f"/api/orders/{created[0]['id']}", json={"status": "completed"})
+    return created
+
+
+def export(client, path, fmt, **params):
+    response = client.get(path, query_string={"format": fmt, **params},
+                          headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    if fmt == "parquet":
+        return response, pq.read_table(io.BytesIO(response.get_data()))
+    return response, pa.ipc.open_stream(response.get_data()).read_all()
+
+
+@pytest.mark.parametrize("fmt, extension", [("parquet", "parquet"), ("arrow", "arrows")])
+def test_orders_round_trip(client, db, user, orders, fmt, extension):
+    response, table = export(client, "/api/orders/export", fmt)
+    json_orders = client.get("/api/orders/export").get_json()["orders"]
+
+    assert response.headers["Content-Disposition"] == \
+        f'attachment; filename="orders_export.{extension}"'
+    assert table.schema.field("created_at").type == pa.timestamp("us")
+    rows = {row["id"]: row for row in table.to_pylist()}
+    assert set(rows) == {order["id"] for order in json_orders}
+    for order in json_orders:
+        row = rows[order["id"]]
+        assert (row["user_name"], row["product_name"], row["amount"], row["status"]) == \
+            (order["user_name"], order["product_name"], order["amount"], order["status"])
+        assert row["created_at"].isoformat() == order["created_at"]
+        assert row["archived"] is False
+
+
+def test_orders_with_archive_and_filters(client, db, user, orders):
+    archive_orders(archive_cutoff(-1))
+
+    _, active = export(client, "/api/orders/export", "arrow")
+    _, combined = export(client, "/api/orders/export", "arrow", include_archived=1)
+    _, completed = export(client, "/api/orders/export", "parquet",
+                          include_archived=1, status="completed")
+
+    assert active.num_rows == 4
+    assert combined.num_rows == 5
+    assert completed.column("archived").to_pylist() == [True]
+    assert completed.column("id").to_pylist() == [orders[0]["id"]]
+
+
+def test_users_round_trip(client, db, user, orders):
+    _, table = export(client, "/api/users/export", "parquet")
+
+    row, = table.to_pylist()
+    assert (row["id"], row["name"], row["email"]) == (user["id"], "Ana", "ana@example.com")
+    assert (row["order_count"], row["order_total"]) == (5, sum(i + 0.5 for i in range(5)))
+
+
+def test_invalid_format_and_missing_pyarrow(client, db, monkeypatch):
+    assert client.get("/api/orders/export?format=csv").status_code == 400
+
+    monkeypatch.setattr(api.routes, "load_pyarrow", lambda: None)
+    response = client.get("/api/orders/export?format=parquet")
+    assert response.status_code == 501
+    assert client.get("/api/orders/export").status_code == 200
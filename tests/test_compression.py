@@ -0,0 +1,78 @@
+"""Compresión gzip/brotli negociada con Accept-Encoding (api/compression.py)"""
+import gzip
+
+import brotli
+import pyarrow as pa
+
+
+def create_users(client, count):
+    client.post("/api/users/batch", json={"users": [
+        {"name": f"Usuario {i}", "email": f"usuario{i}@example.com"} for i in range(count)]})
+
+
+def get(client, path, accept_encoding, **kwargs):
+    return client.get(path, headers={"Accept-Encoding": accept_encoding}, **kwargs)
+
+
+def test_prefers_brotli_then_gzip(client, db):
+    create_users(client, 20)
+    plain = client.get("/api/users?per_page=20").get_data()
+
+    brotli_response = get(client, "/api/users?per_page=20", "gzip, br")
+    gzip_response = get(client, "/api/users?per_page=20", "gzip, br;q=0")
+
+    assert brotli_response.headers["Content-Encoding"] == "br"
+    assert brotli.decompress(brotli_response.get_data()) == plain
+    assert gzip_response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(gzip_response.get_data()) == plain
+    assert "Accept-Encoding" in gzip_response.headers["Vary"]
+
+
+def test_identity_and_small_responses_are_not_compressed(client, db):
+    create_users(client, 20)
+
+    identity = get(client, "/api/users?per_page=20", "identity")
+    small = get(client, "/api/hello", "gzip, br")
+
+    assert "Content-Encoding" not in identity.headers
+    assert "Accept-Encoding" in identity.headers["Vary"]
+    assert "Content-Encoding" not in small.headers
+
+
+def test_etag_differs_per_encoding(app, client, db, monkeypatch):
+    monkeypatch.setitem(app.config, "COMPRESSION_MIN_SIZE", 0)
+    user = client.post("/api/users", json={"name": "Ana", "email": "ana@example.com"}).get_json()
+    path = f"/api/users/{user['id']}"
+
+    plain = client.put(path, json={"name": "Ana María"}, headers={"Accept-Encoding": "identity"})
+    compressed = client.put(path, json={"name": "Anita"}, headers={"Accept-Encoding": "gzip"})
+
+    assert plain.headers["ETag"] == '"2"'
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.headers["ETag"] == '"3-gzip"'
+
+
+def test_streamed_arrow_export_is_compressed_per_chunk(app, client, db, monkeypatch):
+    monkeypatch.setitem(app.config, "EXPORT_CHUNK_SIZE", 5)
+    create_users(client, 20)
+
+    for encoding, decompress in (("gzip", gzip.decompress), ("br", brotli.decompress)):
+        response = get(client, "/api/users/export?format=arrow", encoding, buffered=False)
+        chunks = list(response.response)
+        response.close()
+
+        assert response.headers["Content-Encoding"] == encoding
+        assert "Content-Length" not in response.headers
+        # Un bloque comprimido por cada RecordBatch, no uno al final
+        assert len([chunk for chunk in chunks if chunk]) > 2
+        table = pa.ipc.open_stream(decompress(b"".join(chunks))).read_all()
+        assert table.num_rows == 20
+
+
+def test_parquet_is_sent_as_is(client, db):
+    create_users(client, 20)
+
+    response = get(client, "/api/users/export?format=parquet", "gzip, br")
+
+    assert "Content-Encoding" not in response.headers
+    assert response.get_data()[:4] == b"PAR1"
@@ -0,0 +1,47 @@
+"""Control de concurrencia optimista: If-Match (412) y compare-and-swap (409)"""
+from sqlalchemy import update
+
+import api.routes
+from api.models import User
+
+
+def test_if_match_with_current_version(client, db, user):
+    response = client.put(
+        f"/api/users/{user['id']}", json={"name": "Ana María"},
+        headers={"If-Match": f'"{user["version"]}"'})
+
+    assert response.status_code == 200
+    assert response.get_json()["version"] == user["version"] + 1
+    assert response.headers["ETag"] == f'"{user["version"] + 1}"'
+
+
+def test_if_match_with_stale_version_is_412(client, db, user):
+    client.put(f"/api/users/{user['id']}", json={"name": "Ana María"})
+
+    response = client.put(
+        f"/api/users/{user['id']}", json={"name": "Anita"},
+        headers={"If-Match": f'"{user["version"]}"'})
+
+    assert response.status_code == 412
+    assert response.get_json()["current_version"] == user["version"] + 1
+    assert db.session.get(User, user["id"]).name == "Ana María"
+
+
+def test_concurrent_write_between_read_and_update_is_409(client, db, user, monkeypatch):
+    record_change = api.routes.record_change
+
+    def write_from_other_request(*args):
+        # Otra petición guarda una versión nueva después de que esta leyera el usuario
+        with db.session.no_autoflush:
+            db.session.execute(
+                update(User).where(User.id == user["id"])
+                .values(name="Otra", version=User.version + 1)
+                .execution_options(synchronize_session=False))
+        record_change(*args)
+
+    monkeypatch.setattr(api.routes, "record_change", write_from_other_request)
+    response = client.put(f"/api/users/{user['id']}", json={"name": "Ana María"})
+
+    assert response.status_code == 409
+    assert "reload and retry" in response.get_json()["error"]
+    assert db.session.get(User, user["id"], populate_existing=True).name != "Ana María"
@@ -0,0 +1,85 @@
+"""Server-Sent Events de pedidos: GET /api/orders/stream y el broker en proceso"""
+import json
+
+import pytest
+
+from api.events import EventBroker, broker, format_sse
+
+
+@pytest.fixture
+def stream(app, client, db, monkeypatch):
+    """Abre /api/orders/stream y devuelve un lector de mensajes SSE"""
+    monkeypatch.setitem(app.config, "EVENTS_HEARTBEAT_INTERVAL", 0.01)
+    responses = []
+
+    def open_stream():
+        response = client.get("/api/orders/stream", buffered=False)
+        responses.append(response)
+        return response
+
+    yield open_stream
+    for response in responses:
+        response.close()
+
+
+def next_event(messages):
+    """Siguiente mensaje que no sea keep-alive, como (tipo, datos)"""
+    for message in messages:
+        if not message.startswith(b":"):
+            fields = dict(line.split(": ", 1) for line in message.decode().strip().split("\n"))
+            return fields["event"], json.loads(fields["data"])
+
+
+def test_stream_delivers_created_and_status_changed(client, user, stream):
+    response = stream()
+    messages = iter(response.response)
+
+    assert response.mimetype == "text/event-stream"
+    assert response.headers["Cache-Control"] == "no-cache"
+    assert next(messages) == b"retry: 3000\n\n"
+    # Sin eventos solo llegan comentarios keep-alive
+    assert next(messages) == b": keep-alive\n\n"
+
+    order = client.post("/api/orders", json={
+        "user_id": user["id"], "product_name": "Teclado", "amount": 10}).get_json()
+    client.patch(f"/api/orders/{order['id']}", json={"status": "completed"})
+
+    event_type, data = next_event(messages)
+    assert (event_type, data["id"], data["status"]) == ("order.created", order["id"], "pending")
+    event_type, data = next_event(messages)
+    assert (event_type, data["status"], data["previous_status"]) == \
+        ("order.status_changed", "completed", "pending")
+
+
+def test_streams_over_the_limit_get_503(app, client, monkeypatch, stream):
+    monkeypatch.setitem(app.config, "EVENTS_MAX_STREAMS", 1)
+    first = stream()
+
+    rejected = client.get("/api/orders/stream")
+    assert rejected.status_code == 503
+    assert "Retry-After" in rejected.headers
+
+    # Cerrar la conexión libera su plaza
+    first.close()
+    assert broker.subscriber_count == 0
+    assert stream().status_code == 200
+
+
+def test_slow_subscriber_gets_resync():
+    events = EventBroker(queue_size=2)
+    subscription = events.subscribe()
+
+    for number in range(3):
+        events.publish("order.created", {"id": number})
+
+    assert subscription.get(timeout=0)["type"] == "resync"
+    assert subscription.get(timeout=0) is None
+    events.publish("order.created", {"id": 3})
+    assert subscription.get(timeout=0)["data"] == {"id": 3}
+
+
+def test_format_sse():
+    assert format_sse({"id": 7, "type": "order.created", "data": {"id": 1}}) == \
+        'id: 7\nevent: order.created\ndata: {"id": 1}\n\n'
+    assert format_sse({"id": None, "type": "resync", "data": {}}) == \
+        "event: resync\ndata: {}\n\n"
@@ -0,0 +1,82 @@
+"""Cabecera Idempotency-Key en los endpoints de creación (api/idempotency.py)"""
+import json
+from datetime import timedelta
+
+from api.idempotency import _hash_request
+from api.models import IdempotencyKey, Order
+from api.utils import utcnow
+
+
+def order_body(user, product_name="Teclado"):
+    return {"user_id": user["id"], "product_name": product_name, "amount": 25}
+
+
+def post_order(client, user, key, product_name="Teclado"):
+    return client.post(
+        "/api/orders", data=json.dumps(order_body(user, product_name)),
+        content_type="application/json", headers={"Idempotency-Key": key})
+
+
+def reserve_key(app, db, key, body, status="in_progress", locked_for=60):
+    """Reserva `key` como lo haría otra petición a POST /api/orders con `body`"""
+    with app.test_request_context(
+            "/api/orders", method="POST", data=json.dumps(body),
+            content_type="application/json"):
+        request_hash = _hash_request()
+    db.session.add(IdempotencyKey(
+        key=key,
+        request_hash=request_hash,
+        status=status,
+        locked_until=utcnow() + timedelta(seconds=locked_for),
+        expires_at=utcnow() + timedelta(hours=1)))
+    db.session.commit()
+
+
+def test_retry_replays_stored_response(client, db, user):
+    first = post_order(client, user, "order-1")
+    retry = post_order(client, user, "order-1")
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.get_json() == first.get_json()
+    assert retry.headers["ETag"] == first.headers["ETag"]
+    assert Order.query.count() == 1
+
+
+def test_same_key_with_other_body_is_rejected(client, db, user):
+    post_order(client, user, "order-1")
+    response = post_order(client, user, "order-1", product_name="Ratón")
+
+    assert response.status_code == 422
+    assert Order.query.count() == 1
+
+
+def test_waits_for_request_in_progress_then_409(app, client, db, user):
+    reserve_key(app, db, "order-1", order_body(user))
+
+    response = post_order(client, user, "order-1")
+
+    assert response.status_code == 409
+    assert response.headers["Retry-After"] == "1"
+    assert Order.query.count() == 0
+
+
+def test_expired_reservation_is_taken_over(app, client, db, user):
+    # El worker que reservó la clave murió sin confirmar nada
+    reserve_key(app, db, "order-1", order_body(user), locked_for=-1)
+
+    response = post_order(client, user, "order-1")
+
+    assert response.status_code == 201
+    assert Order.query.count() == 1
+    assert db.session.get(IdempotencyKey, "order-1").status == "completed"
+
+
+def test_committed_without_response_is_not_repeated(app, client, db, user):
+    # La operación se confirmó pero el worker murió antes de guardar la respuesta
+    reserve_key(app, db, "order-1", order_body(user), status="committed", locked_for=-1)
+
+    response = post_order(client, user, "order-1")
+
+    assert response.status_code == 409
+    assert Order.query.count() == 0
@@ -0,0 +1,82 @@
+"""scripts/loadtest.py: SLOs de los escenarios y consultas por petición de los lotes"""
+import importlib.util
+import os
+
+import pytest
+from sqlalchemy import event
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), "..", "scripts")
+
+
+def load_script():
+    spec = importlib.util.spec_from_file_location(
+        "loadtest", os.path.join(SCRIPTS_DIR, "loadtest.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+loadtest = load_script()
+_, SCENARIOS = loadtest.load_scenarios(loadtest.DEFAULT_SCENARIOS, None)
+
+
+@pytest.fixture
+def count_queries(db):
+    """Sentencias SQL ejecutadas, sin los SAVEPOINT de los fixtures"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        if not statement.startswith(("SAVEPOINT", "RELEASE", "ROLLBACK TO")):
+            statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+
+def scenario(name):
+    return next(scenario for scenario in SCENARIOS if scenario["name"] == name)
+
+
+def test_sqlite_overrides_drop_thresholds():
+    slo = loadtest.scenario_slo(scenario("batch_upload_orders"), "slo_sqlite")
+
+    assert "p95_ms" not in slo
+    assert slo["max_queries"] == scenario("batch_upload_orders")["slo"]["max_queries"]
+    assert loadtest.scenario_slo(scenario("batch_upload_orders"), None)["p95_ms"] == 2500
+
+
+def test_every_scenario_bounds_queries():
+    assert all("max_queries" in scenario["slo"] for scenario in SCENARIOS)
+
+
+def test_per_row_queries_breach_the_slo():
+    stats = loadtest.ScenarioStats()
+    stats.add(201, 0.1, 5)
+    stats.add(201, 0.1, 304)
+
+    breaches = loadtest.check_slo({"max_queries": 6, "max_error_rate": 0.05}, stats)
+
+    assert breaches == ["queries/request 304 > 6"]
+
+
+def test_batch_orders_within_scenario_bound(client, user, count_queries):
+    size = scenario("batch_upload_orders")["params"]["size"]
+    orders = [{"user_id": user["id"], "product_name": f"Producto {i}", "amount": 1}
+              for i in range(size)]
+
+    count_queries.clear()
+    response = client.post("/api/orders/batch", json={"orders": orders})
+
+    assert response.get_json()["created"] == size
+    assert len(count_queries) <= scenario("batch_upload_orders")["slo"]["max_queries"]
+
+
+def test_batch_users_within_scenario_bound(client, db, count_queries):
+    size = scenario("batch_upload_users")["params"]["size"]
+    users = [{"name": f"Usuario {i}", "email": f"usuario{i}@example.com"} for i in range(size)]
+
+    response = client.post("/api/users/batch", json={"users": users})
+
+    assert response.get_json()["created"] == size
+    assert len(count_queries) <= scenario("batch_upload_users")["slo"]["max_queries"]
@@ -0,0 +1,107 @@
+"""Reserva de pedidos pendientes con POST /api/orders/claim (api/order_queue.py)"""
+import threading
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app import create_app
+from api.config import TestingConfig
+from api.models import db as _db, Order
+from api.utils import utcnow
+
+
+def create_orders(client, user, count):
+    ids = []
+    for index in range(count):
+        response = client.post("/api/orders", json={
+            "user_id": user["id"], "product_name": f"Producto {index}", "amount": 10})
+        assert response.status_code == 201
+        ids.append(response.get_json()["id"])
+    return ids
+
+
+def claim(client, worker, limit=10, lease_seconds=60):
+    response = client.post("/api/orders/claim", json={
+        "worker": worker, "limit": limit, "lease_seconds": lease_seconds})
+    assert response.status_code == 200
+    return response.get_json()["orders"]
+
+
+def test_workers_get_disjoint_orders_oldest_first(client, db, user):
+    order_ids = create_orders(client, user, 5)
+
+    first = claim(client, "worker-a", limit=3)
+    second = claim(client, "worker-b", limit=3)
+
+    assert [order["id"] for order in first] == order_ids[:3]
+    assert [order["id"] for order in second] == order_ids[3:]
+    assert claim(client, "worker-c") == []
+
+
+def test_only_pending_orders_are_claimed(client, db, user):
+    completed, pending = create_orders(client, user, 2)
+    client.patch(f"/api/orders/{completed}", json={"status": "completed"})
+
+    assert [order["id"] for order in claim(client, "worker-a")] == [pending]
+
+
+def test_expired_claim_is_reclaimed_and_old_worker_gets_412(client, db, user):
+    order_id, = create_orders(client, user, 1)
+    stale, = claim(client, "worker-a")
+    db.session.execute(
+        update(Order).where(Order.id == order_id)
+        .values(claim_expires_at=utcnow() - timedelta(seconds=1))
+        .execution_options(synchronize_session=False))
+    db.session.commit()
+
+    current, = claim(client, "worker-b")
+    response = client.patch(
+        f"/api/orders/{order_id}", json={"status": "completed"},
+        headers={"If-Match": f'"{stale["version"]}"'})
+
+    assert current["id"] == order_id
+    assert current["version"] > stale["version"]
+    assert response.status_code == 412
+
+
+@pytest.fixture
+def shared_app(tmp_path):
+    """App sin la transacción del fixture db: cada hilo usa su propia conexión"""
+    uri = f"sqlite:///{tmp_path / 'queue.db'}"
+
+    class Config(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = uri
+        SQLALCHEMY_ENGINE_OPTIONS = {"connect_args": {"timeout": 30}}
+
+    app = create_app(Config, with_cli=False)
+    with app.app_context():
+        _db.create_all()
+    yield app
+    with app.app_context():
+        _db.engine.dispose()
+
+
+def test_concurrent_claims_never_share_an_order(shared_app):
+    client = shared_app.test_client()
+    user = client.post("/api/users", json={"name": "Ana", "email": "ana@example.com"}).get_json()
+    order_ids = create_orders(client, user, 40)
+    claimed = {}
+
+    def work(worker):
+        worker_client = shared_app.test_client()
+        claimed[worker] = []
+        while True:
+            orders = claim(worker_client, worker, limit=3)
+            if not orders:
+                break
+            claimed[worker].extend(order["id"] for order in orders)
+
+    threads = [threading.Thread(target=work, args=(f"worker-{n}",)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    all_claimed = [order_id for ids in claimed.values() for order_id in ids]
+    assert sorted(all_claimed) == order_ids
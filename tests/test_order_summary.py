@@ -0,0 +1,77 @@
+"""Resumen de pedidos desnormalizado en User (apply_order_summary_deltas)"""
+from api.models import User, refresh_order_summaries
+
+
+def create_order(client, user, amount=10):
+    return client.post("/api/orders", json={
+        "user_id": user["id"], "product_name": "Teclado", "amount": amount}).get_json()
+
+
+def summary(client, user, **params):
+    return client.get(f"/api/users/{user['id']}/orders", query_string=params).get_json()
+
+
+def recomputed(db, user):
+    """Resumen calculado desde las tablas de pedidos"""
+    refresh_order_summaries([user["id"]])
+    return db.session.get(User, user["id"], populate_existing=True).order_summary()
+
+
+def test_create_updates_summary(client, db, user):
+    create_order(client, user, amount=10)
+    order = create_order(client, user, amount=5.5)
+
+    order_summary = summary(client, user)["user"]["order_summary"]
+
+    assert order_summary["order_count"] == 2
+    assert order_summary["total_amount"] == 15.5
+    assert order_summary["by_status"] == {"pending": 2, "completed": 0, "cancelled": 0}
+    assert order_summary["last_order_at"] == order["created_at"]
+    assert order_summary == recomputed(db, user)
+
+
+def test_status_patch_moves_counter(client, db, user):
+    order = create_order(client, user)
+    create_order(client, user)
+
+    client.patch(f"/api/orders/{order['id']}", json={"status": "completed"})
+    # Repetir el mismo estado no vuelve a mover el contador
+    client.patch(f"/api/orders/{order['id']}", json={"status": "completed"})
+
+    response = summary(client, user, status="pending")
+    order_summary = response["user"]["order_summary"]
+    assert order_summary["by_status"] == {"pending": 1, "completed": 1, "cancelled": 0}
+    assert order_summary["order_count"] == 2
+    assert response["total_orders"] == 1
+    assert order_summary == recomputed(db, user)
+
+
+def test_batch_applies_one_delta_per_user(client, db, user):
+    other = client.post("/api/users", json={"name": "Luis", "email": "luis@example.com"}).get_json()
+
+    response = client.post("/api/orders/batch", json={"orders": [
+        {"user_id": user["id"], "product_name": "Teclado", "amount": 10},
+        {"user_id": str(user["id"]), "product_name": "Ratón", "amount": 5},
+        {"user_id": other["id"], "product_name": "Monitor", "amount": 100},
+        {"user_id": other["id"], "product_name": "Cable", "amount": 0},
+    ]})
+
+    assert response.status_code == 201
+    assert response.get_json()["created"] == 3
+    user_summary = summary(client, user)["user"]["order_summary"]
+    other_summary = summary(client, other)["user"]["order_summary"]
+    assert (user_summary["order_count"], user_summary["total_amount"]) == (2, 15)
+    assert (other_summary["order_count"], other_summary["total_amount"]) == (1, 100)
+    assert user_summary["by_status"]["pending"] == 2
+    assert user_summary == recomputed(db, user)
+    assert other_summary == recomputed(db, other)
+
+
+def test_batch_response_keeps_request_order(client, db, user):
+    response = client.post("/api/orders/batch", json={"orders": [
+        {"user_id": user["id"], "product_name": name, "amount": 1}
+        for name in ("A", "B", "C")
+    ]}).get_json()
+
+    assert [order["product_name"] for order in response["orders"]] == ["A", "B", "C"]
+    assert {order["user_name"] for order in response["orders"]} == {"Ana"}
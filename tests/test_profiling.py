@@ -0,0 +1,120 @@
+"""Profiling bajo demanda (api/profiling.py) y GET /api/profiles"""
+import pytest
+
+from app import create_app
+from api.config import TestingConfig, engine_options
+from api.models import db
+from api.profiling import ProfileStore
+
+SECRET = "s3cret"
+TOKEN = {"X-Profile-Token": SECRET}
+
+
+@pytest.fixture(scope="module")
+def profiled_app(tmp_path_factory):
+    """App con PROFILING_SECRET (el middleware se instala en create_app)"""
+    directory = tmp_path_factory.mktemp("profiling")
+    uri = f"sqlite:///{directory / 'test.db'}"
+
+    class Config(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = uri
+        SQLALCHEMY_ENGINE_OPTIONS = engine_options(uri)
+        PROFILING_SECRET = SECRET
+        PROFILING_DIR = str(directory / "profiles")
+        PROFILING_INTERVAL = 0.001
+
+    app = create_app(Config, with_cli=False)
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def profiled_client(profiled_app):
+    return profiled_app.test_client()
+
+
+def profiled_get(client, path, headers=TOKEN):
+    """
+    GET que cierra la respuesta, como hace el servidor al terminar de
+    enviarla: el perfil se guarda entonces (ver ProfiledBody)
+    """
+    response = client.get(path, headers=headers)
+    response.close()
+    return response
+
+
+def profiles(client):
+    return client.get("/api/profiles", headers=TOKEN).get_json()["profiles"]
+
+
+def test_request_with_token_is_profiled(profiled_client):
+    response = profiled_get(profiled_client, "/api/users?search=an")
+    profile_id = response.headers["X-Profile-Id"]
+
+    profile = profiled_client.get(f"/api/profiles/{profile_id}", headers=TOKEN).get_json()
+    assert (profile["method"], profile["route"], profile["status"]) == ("GET", "/api/users", 200)
+    assert profile["query_string"] == "search=an"
+    assert profile["sql_count"] == sum(statement["count"] for statement in profile["sql"]) > 0
+    assert profile["samples"] == sum(profile["stacks"].values())
+
+    summary = next(p for p in profiles(profiled_client) if p["id"] == profile_id)
+    assert "stacks" not in summary
+
+
+def test_collapsed_format(profiled_client):
+    profile_id = profiled_get(profiled_client, "/api/users").headers["X-Profile-Id"]
+    profile = profiled_client.get(f"/api/profiles/{profile_id}", headers=TOKEN).get_json()
+
+    response = profiled_client.get(
+        f"/api/profiles/{profile_id}?format=collapsed", headers=TOKEN)
+
+    assert response.mimetype == "text/plain"
+    lines = response.get_data(as_text=True).splitlines()
+    assert len(lines) == len(profile["stacks"])
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines if line)
+    assert profiled_client.get(
+        f"/api/profiles/{profile_id}?format=svg", headers=TOKEN).status_code == 400
+
+
+def test_requests_without_valid_token_are_not_profiled(profiled_client):
+    before = len(profiles(profiled_client))
+
+    plain = profiled_get(profiled_client, "/api/users", headers={})
+    wrong = profiled_get(profiled_client, "/api/users", headers={"X-Profile-Token": "otro"})
+
+    assert "X-Profile-Id" not in plain.headers
+    assert "X-Profile-Id" not in wrong.headers
+    assert len(profiles(profiled_client)) == before
+
+
+def test_event_stream_is_not_profiled(profiled_client):
+    before = len(profiles(profiled_client))
+
+    response = profiled_client.get("/api/orders/stream", headers=TOKEN, buffered=False)
+    response.close()
+
+    assert "X-Profile-Id" not in response.headers
+    assert len(profiles(profiled_client)) == before
+    # El lock del middleware quedó libre
+    assert "X-Profile-Id" in profiled_get(profiled_client, "/api/hello").headers
+
+
+def test_profiles_access(profiled_client, client):
+    assert profiled_client.get("/api/profiles").status_code == 403
+    assert profiled_client.get("/api/profiles", headers={"X-Profile-Token": "otro"}).status_code == 403
+    assert profiled_client.get("/api/profiles/nope", headers=TOKEN).status_code == 404
+    # Sin PROFILING_SECRET no hay perfiles
+    assert client.get("/api/profiles", headers=TOKEN).status_code == 404
+
+
+def test_store_keeps_most_recent(tmp_path):
+    store = ProfileStore(str(tmp_path), max_profiles=2)
+    for timestamp in ("1700000000001", "1700000000002", "1700000000003"):
+        store.save({"id": f"{timestamp}-0000abcd", "sql": [], "stacks": {}})
+
+    assert [profile["id"] for profile in store.list()] == [
+        "1700000000003-0000abcd", "1700000000002-0000abcd"]
+    assert store.get("1700000000001-0000abcd") is None
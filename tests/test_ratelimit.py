@@ -0,0 +1,80 @@
+"""Rate limiting de los endpoints costosos: 429 con Retry-After y métricas"""
+import pytest
+
+from api.metrics import metrics
+from api.ratelimit import LocalRateLimitBackend
+
+SEARCH = "api.get_users"
+
+
+@pytest.fixture
+def limited(app, monkeypatch):
+    """Activa el rate limiting (TestingConfig lo desactiva) con estado limpio"""
+    monkeypatch.setitem(app.config, "RATELIMIT_ENABLED", True)
+    # Búsqueda: 0.5 peticiones/s con ráfaga de 2 y 1 concurrente
+    monkeypatch.setitem(app.config, "RATE_LIMITS", {
+        "export": (0.2, 3, 2), "batch": (1.0, 5, 4), "search": (0.5, 2, 1)})
+    backend = LocalRateLimitBackend(app.config)
+    monkeypatch.setitem(app.extensions, "ratelimit", backend)
+    metrics.reset()
+    yield backend
+    metrics.reset()
+
+
+def search(client, remote_addr="10.0.0.1"):
+    return client.get("/api/users?search=an", environ_base={"REMOTE_ADDR": remote_addr})
+
+
+def decisions(route=SEARCH):
+    return {
+        counter["labels"]["decision"]: counter["value"]
+        for counter in metrics.snapshot().get("ratelimit_decisions", [])
+        if counter["labels"]["route"] == route
+    }
+
+
+def test_burst_then_429_with_retry_after(client, db, limited):
+    statuses = [search(client).status_code for _ in range(3)]
+
+    assert statuses == [200, 200, 429]
+    response = search(client)
+    assert response.get_json()["error"] == "Too many requests, please retry later"
+    # Falta un token entero a 0.5 tokens/s
+    assert response.headers["Retry-After"] == "2"
+    assert decisions() == {"allowed": 2, "throttled": 2}
+
+
+def test_buckets_are_per_client(client, db, limited):
+    for _ in range(2):
+        search(client, "10.0.0.1")
+
+    assert search(client, "10.0.0.1").status_code == 429
+    assert search(client, "10.0.0.2").status_code == 200
+
+
+def test_listing_without_search_is_not_limited(client, db, limited):
+    statuses = {client.get("/api/users").status_code for _ in range(5)}
+
+    assert statuses == {200}
+    assert decisions() == {}
+
+
+def test_concurrency_limit_rejects_with_retry_after(client, db, limited):
+    # Otra petición de búsqueda sigue en curso
+    assert limited.acquire_slot((SEARCH, "in_flight"), 1)
+
+    response = search(client)
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    assert decisions() == {"concurrency_rejected": 1}
+    limited.release_slot((SEARCH, "in_flight"))
+    assert search(client).status_code == 200
+
+
+def test_metrics_endpoint_exposes_decisions(client, db, limited):
+    search(client)
+
+    counters = client.get("/api/metrics").get_json()["ratelimit_decisions"]
+
+    assert {"labels": {"route": SEARCH, "decision": "allowed"}, "value": 1} in counters
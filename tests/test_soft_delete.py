@@ -0,0 +1,90 @@
+"""Borrado lógico, restauración y purge-deleted (api/soft_delete.py)"""
+from datetime import timedelta
+
+from sqlalchemy import select
+
+from api.archive import archive_cutoff, archive_orders
+from api.models import Order, User
+from api.soft_delete import purge_deleted, soft_delete_orders
+from api.utils import utcnow
+
+
+def create_order(client, user, amount=10):
+    return client.post("/api/orders", json={
+        "user_id": user["id"], "product_name": "Teclado", "amount": amount}).get_json()
+
+
+def row_count(db, model):
+    """Filas de la tabla, incluidas las borradas"""
+    return len(db.session.execute(
+        select(model.id).execution_options(include_deleted=True)).all())
+
+
+def purge_all():
+    """Elimina todo lo borrado, sin importar cuándo"""
+    return purge_deleted(utcnow() + timedelta(minutes=1))
+
+
+def test_deleted_user_and_orders_are_hidden(client, db, user):
+    create_order(client, user)
+
+    response = client.delete(f"/api/users/{user['id']}")
+
+    assert response.get_json()["deleted_orders"] == 1
+    assert client.get("/api/users").get_json()["users"] == []
+    assert client.get("/api/orders").get_json()["orders"] == []
+    assert client.get(f"/api/users/{user['id']}/orders").status_code == 404
+    assert client.delete(f"/api/users/{user['id']}").status_code == 404
+    # Las filas siguen ahí hasta purgarlas
+    assert (row_count(db, User), row_count(db, Order)) == (1, 1)
+
+
+def test_restore_brings_back_orders_deleted_with_the_user(client, db, user):
+    kept = create_order(client, user, amount=10)
+    deleted_before = create_order(client, user, amount=5)
+    soft_delete_orders([deleted_before["id"]])
+    db.session.commit()
+    client.delete(f"/api/users/{user['id']}")
+
+    response = client.post(f"/api/users/{user['id']}/restore")
+
+    assert response.status_code == 200
+    assert response.get_json()["restored_orders"] == 1
+    orders = client.get(f"/api/users/{user['id']}/orders").get_json()
+    assert [order["id"] for order in orders["orders"]] == [kept["id"]]
+    assert orders["user"]["order_summary"]["order_count"] == 1
+    assert orders["user"]["order_summary"]["total_amount"] == 10
+
+
+def test_restore_of_active_or_missing_user(client, db, user):
+    assert client.post(f"/api/users/{user['id']}/restore").status_code == 400
+    assert client.post(f"/api/users/{user['id'] + 1}/restore").status_code == 404
+
+
+def test_purge_removes_deleted_rows(client, db, user):
+    other = client.post("/api/users", json={"name": "Luis", "email": "luis@example.com"}).get_json()
+    create_order(client, user)
+    create_order(client, other)
+    client.delete(f"/api/users/{user['id']}")
+
+    assert purge_all() == (1, 1)
+    assert (row_count(db, User), row_count(db, Order)) == (1, 1)
+    assert client.post(f"/api/users/{user['id']}/restore").status_code == 404
+
+
+def test_purge_respects_cutoff(client, db, user):
+    create_order(client, user)
+    client.delete(f"/api/users/{user['id']}")
+
+    assert purge_deleted(utcnow() - timedelta(days=1)) == (0, 0)
+    assert (row_count(db, User), row_count(db, Order)) == (1, 1)
+
+
+def test_purge_keeps_users_with_archived_orders(client, db, user):
+    order = create_order(client, user)
+    client.patch(f"/api/orders/{order['id']}", json={"status": "completed"})
+    archive_orders(archive_cutoff(-1))
+    client.delete(f"/api/users/{user['id']}")
+
+    assert purge_all() == (0, 0)
+    assert row_count(db, User) == 1
@@ -0,0 +1,73 @@
+"""Ficheros estáticos del SPA: Cache-Control, ETag/304 y variantes comprimidas"""
+import gzip
+
+import pytest
+from flask import Flask, request
+
+from api.static_assets import (
+    IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, StaticManifest, is_hashed_asset
+)
+
+SCRIPT = b"console.log('hola');\n" * 100
+
+
+@pytest.fixture
+def dist(tmp_path):
+    """dist/ de Vite con un asset con hash, index.html y un fichero de public/"""
+    (tmp_path / "assets").mkdir()
+    (tmp_path / "assets" / "index-B2x9Kf_a.js").write_bytes(SCRIPT)
+    (tmp_path / "index.html").write_bytes(b"<!doctype html><div id='root'></div>")
+    (tmp_path / "robots.txt").write_bytes(b"User-agent: *\n")
+    return StaticManifest(str(tmp_path))
+
+
+def serve(manifest, path, **headers):
+    with Flask(__name__).test_request_context(f"/{path}", headers=headers):
+        return manifest.serve(request, path)
+
+
+def test_hashed_assets_are_immutable(dist):
+    assert serve(dist, "assets/index-B2x9Kf_a.js").headers["Cache-Control"] == IMMUTABLE_CACHE_CONTROL
+    assert serve(dist, "index.html").headers["Cache-Control"] == REVALIDATE_CACHE_CONTROL
+    assert serve(dist, "robots.txt").headers["Cache-Control"] == REVALIDATE_CACHE_CONTROL
+
+
+def test_hashed_name_detection():
+    assert is_hashed_asset("assets/logo-3f8a1c2d.svg")
+    assert not is_hashed_asset("assets/logo.svg")
+    assert not is_hashed_asset("public/logo-3f8a1c2d.svg")
+
+
+def test_if_none_match_returns_304(dist):
+    first = serve(dist, "assets/index-B2x9Kf_a.js")
+    etag = first.headers["ETag"]
+
+    revalidated = serve(dist, "assets/index-B2x9Kf_a.js", **{"If-None-Match": etag})
+    changed = serve(dist, "assets/index-B2x9Kf_a.js", **{"If-None-Match": '"otro"'})
+
+    assert revalidated.status_code == 304
+    assert revalidated.get_data() == b""
+    assert revalidated.headers["ETag"] == etag
+    assert revalidated.headers["Cache-Control"] == IMMUTABLE_CACHE_CONTROL
+    assert changed.status_code == 200
+
+
+def test_precompressed_variants_have_their_own_etag(dist):
+    plain = serve(dist, "assets/index-B2x9Kf_a.js", **{"Accept-Encoding": "identity"})
+    compressed = serve(dist, "assets/index-B2x9Kf_a.js", **{"Accept-Encoding": "gzip"})
+
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(compressed.get_data()) == plain.get_data() == SCRIPT
+    assert compressed.headers["ETag"] == plain.headers["ETag"][:-1] + '-gzip"'
+    assert "Accept-Encoding" in compressed.headers["Vary"]
+    # El ETag de una codificación no valida la otra
+    assert serve(dist, "assets/index-B2x9Kf_a.js", **{
+        "Accept-Encoding": "identity", "If-None-Match": compressed.headers["ETag"]}).status_code == 200
+
+
+def test_unknown_paths_fall_back_to_index(dist):
+    response = serve(dist, "orders/42")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/html"
+    assert response.headers["Cache-Control"] == REVALIDATE_CACHE_CONTROL